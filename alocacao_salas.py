@@ -0,0 +1,103 @@
+from collections import defaultdict
+from models import DIAS_SEMANA
+
+def sala_compativel(sala, turma, disciplina):
+    """Verifica se a sala comporta a turma e é do tipo exigido pela disciplina"""
+    if disciplina is not None and disciplina.tipo_sala and sala.tipo != disciplina.tipo_sala:
+        return False
+    return turma is None or sala.capacidade >= turma.alunos
+
+def atribuir_salas(aulas, turmas, disciplinas, salas, fixas=None):
+    """Atribui as salas de cada horário por emparelhamento bipartido máximo
+
+    Em cada (dia, horário) as aulas são ligadas às salas compatíveis e o
+    emparelhamento é construído por caminhos aumentantes (algoritmo de Kuhn).
+    Aulas cuja chave (turma, disciplina, dia, horário) está em `fixas`
+    mantêm a sala que já têm, e essa sala sai das opções das demais.
+    Nas disciplinas geminadas, os horários seguidos da mesma turma e dia
+    formam um bloco que fica todo na sala do seu primeiro horário (ou na da
+    aula fixa do bloco); se ela não estiver livre, a aula fica sem sala.
+    Altera `aula.sala` e retorna as aulas que ficaram sem sala.
+    """
+    fixas = fixas or set()
+    turmas_por_nome = {turma.nome: turma for turma in turmas}
+    disciplinas_por_chave = {(disc.nome, disc.grupo): disc for disc in disciplinas}
+
+    aulas_por_slot = defaultdict(list)
+    ocupadas_por_slot = defaultdict(set)
+    for aula in aulas:
+        if (aula.turma, aula.disciplina, aula.dia, aula.horario) in fixas and aula.sala:
+            ocupadas_por_slot[(aula.dia, aula.horario)].add(aula.sala)
+        else:
+            aulas_por_slot[(aula.dia, aula.horario)].append(aula)
+
+    # Blocos geminados: cada aula aponta para a lista de aulas do seu bloco
+    por_chave = {(aula.turma, aula.disciplina, aula.dia, aula.horario): aula for aula in aulas}
+    bloco_da_aula = {}
+    for aula in sorted(aulas, key=lambda aula: aula.horario):
+        disc = disciplinas_por_chave.get((aula.disciplina, aula.grupo))
+        anterior = por_chave.get((aula.turma, aula.disciplina, aula.dia, aula.horario - 1))
+        if disc is not None and disc.tamanho_bloco > 1 and anterior is not None:
+            bloco = bloco_da_aula[id(anterior)]
+        else:
+            bloco = []
+        bloco.append(aula)
+        bloco_da_aula[id(aula)] = bloco
+    sala_do_bloco = {}  # id do bloco -> sala de todas as suas aulas ("" se nenhuma)
+    for aula in aulas:
+        if (aula.turma, aula.disciplina, aula.dia, aula.horario) in fixas and aula.sala:
+            sala_do_bloco[id(bloco_da_aula[id(aula)])] = aula.sala
+
+    sem_sala = []
+    # Em ordem de horário: a sala de um bloco é decidida no seu primeiro horário
+    for slot in sorted(aulas_por_slot, key=lambda slot: (DIAS_SEMANA.index(slot[0]), slot[1])):
+        ocupadas = ocupadas_por_slot[slot]
+        aulas_slot = []
+        for aula in aulas_por_slot[slot]:
+            sala = sala_do_bloco.get(id(bloco_da_aula[id(aula)]))
+            if sala is None:
+                aulas_slot.append(aula)
+            elif sala and sala not in ocupadas:
+                aula.sala = sala
+                ocupadas.add(sala)
+            else:
+                sem_sala.append(aula)
+
+        compativeis = [
+            [
+                indice for indice, sala in enumerate(salas)
+                if sala.nome not in ocupadas and sala_compativel(
+                    sala,
+                    turmas_por_nome.get(aula.turma),
+                    disciplinas_por_chave.get((aula.disciplina, aula.grupo))
+                )
+            ]
+            for aula in aulas_slot
+        ]
+        dono = {}  # índice da sala -> índice da aula
+
+        def aumentar(i, visitadas):
+            for j in compativeis[i]:
+                if j in visitadas:
+                    continue
+                visitadas.add(j)
+                if j not in dono or aumentar(dono[j], visitadas):
+                    dono[j] = i
+                    return True
+            return False
+
+        # Aulas com menos salas compatíveis primeiro
+        for i in sorted(range(len(aulas_slot)), key=lambda i: len(compativeis[i])):
+            aumentar(i, set())
+
+        sala_da_aula = {i: j for j, i in dono.items()}
+        for i, aula in enumerate(aulas_slot):
+            bloco = bloco_da_aula[id(aula)]
+            if i in sala_da_aula:
+                aula.sala = salas[sala_da_aula[i]].nome
+            else:
+                sem_sala.append(aula)
+            if len(bloco) > 1:
+                sala_do_bloco[id(bloco)] = aula.sala if i in sala_da_aula else ""
+
+    return sem_sala
@@ -2,12 +2,19 @@ import streamlit as st
 import pandas as pd
 import database
 from session_state import init_session_state
-from auto_save import salvar_tudo
-from models import Turma, Professor, Disciplina, Sala, DIAS_SEMANA, HORARIOS_EFII, HORARIOS_EM, HORARIOS_REAIS
-from scheduler_ortools import GradeHorariaORTools
+from auto_save import salvar_tudo, mostrar_conflitos_salvamento
+from models import Turma, Professor, Disciplina, Sala, AulaFixa, DIAS_SEMANA, HORARIOS_EFII, HORARIOS_EM, HORARIOS_REAIS
+from scheduler_ortools import GradeHorariaORTools, PESOS_PADRAO
 from simple_scheduler import SimpleGradeHoraria
+from portfolio import PortfolioGrade, MOTORES
+from viabilidade import verificar_viabilidade, montar_resultado
+from cache_grades import chave_instancia, buscar_grade, guardar_grade
+from historico_grades import salvar_versao, listar_versoes, carregar_versao, comparar_versoes
 import io
+import os
+import threading
 import traceback
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Configuração da página
 st.set_page_config(page_title="Escola Timetable", layout="wide")
@@ -17,6 +24,7 @@ st.title("🕒 Gerador Inteligente de Grade Horária - Horários Reais")
 try:
     init_session_state()
     st.success("✅ Sistema inicializado com sucesso!")
+    mostrar_conflitos_salvamento()
 except Exception as e:
     st.error(f"❌ Erro na inicialização: {str(e)}")
     st.code(traceback.format_exc())
@@ -94,6 +102,9 @@ def converter_disponibilidade_para_completo(disponibilidade):
         convertido.add(converter_dia_para_completo(dia))
     return convertido
 
+# Tipos de sala que uma disciplina pode exigir ("" = qualquer sala)
+TIPOS_SALA_DISCIPLINA = ["", "normal", "laboratório", "auditório"]
+
 def eh_horario_intervalo_prof(horario, segmento_turma=None):
     """Verifica se é horário de intervalo"""
     if segmento_turma == "EF_II":
@@ -102,6 +113,89 @@ def eh_horario_intervalo_prof(horario, segmento_turma=None):
         return horario == 4  # EM: intervalo no 4º horário (09:30-09:50)
     return False
 
+def editor_aulas_fixas(turma=None, professor=None):
+    """Lista, adiciona e remove as aulas fixas de uma turma ou de um professor"""
+    chave = turma.id if turma else professor.id
+    fixas = [
+        fixa for fixa in st.session_state.aulas_fixas
+        if (turma and fixa.turma == turma.nome) or (professor and fixa.professor == professor.nome)
+    ]
+    
+    st.write("**📌 Aulas fixas:**")
+    if not fixas:
+        st.caption("Nenhuma aula fixa.")
+    for fixa in fixas:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            sala_texto = f" - {fixa.sala}" if fixa.sala else ""
+            st.write(
+                f"{fixa.dia.upper()} {fixa.horario}º: {fixa.disciplina} - "
+                f"{fixa.turma} - {fixa.professor}{sala_texto}"
+            )
+        with col2:
+            if st.button("🗑️", key=f"del_fixa_{chave}_{fixa.id}"):
+                st.session_state.aulas_fixas.remove(fixa)
+                salvar_tudo()
+                st.rerun()
+    
+    with st.form(f"add_fixa_{chave}"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if turma:
+                turma_nome = turma.nome
+                disciplinas_opcoes = [
+                    d.nome for d in st.session_state.disciplinas
+                    if turma.nome in d.turmas and obter_grupo_seguro(d) == obter_grupo_seguro(turma)
+                ]
+                professores_opcoes = [
+                    p.nome for p in st.session_state.professores
+                    if set(p.disciplinas) & set(disciplinas_opcoes)
+                ]
+                disciplina_nome = st.selectbox("Disciplina", disciplinas_opcoes, key=f"fixa_disc_{chave}")
+                professor_nome = st.selectbox("Professor", professores_opcoes, key=f"fixa_prof_{chave}")
+            else:
+                professor_nome = professor.nome
+                turma_nome = st.selectbox(
+                    "Turma", [t.nome for t in st.session_state.turmas], key=f"fixa_turma_{chave}"
+                )
+                disciplina_nome = st.selectbox("Disciplina", professor.disciplinas, key=f"fixa_disc_{chave}")
+        with col2:
+            dia = st.selectbox("Dia", DIAS_SEMANA, key=f"fixa_dia_{chave}")
+            horario = st.selectbox("Horário", list(range(1, 8)), key=f"fixa_hor_{chave}")
+        with col3:
+            sala_nome = st.selectbox(
+                "Sala", [""] + [s.nome for s in st.session_state.salas],
+                format_func=lambda nome: nome or "Qualquer sala compatível",
+                key=f"fixa_sala_{chave}"
+            )
+        
+        if st.form_submit_button("📌 Fixar Aula"):
+            turma_fixa = next((t for t in st.session_state.turmas if t.nome == turma_nome), None)
+            professor_fixo = next((p for p in st.session_state.professores if p.nome == professor_nome), None)
+            ocupado = any(
+                fixa.dia == dia and fixa.horario == horario and (
+                    fixa.turma == turma_nome or fixa.professor == professor_nome or
+                    (sala_nome and fixa.sala == sala_nome)
+                )
+                for fixa in st.session_state.aulas_fixas
+            )
+            if not (turma_fixa and professor_fixo and disciplina_nome):
+                st.error("❌ Preencha turma, disciplina e professor")
+            elif disciplina_nome not in professor_fixo.disciplinas:
+                st.error(f"❌ {professor_nome} não leciona {disciplina_nome}")
+            elif (horario not in obter_horarios_turma(turma_nome) or
+                  eh_horario_intervalo_prof(horario, obter_segmento_turma(turma_nome))):
+                st.error(f"❌ {horario}º não é horário de aula de {turma_nome}")
+            elif ocupado:
+                st.error("❌ Já existe aula fixa da turma, do professor ou da sala neste horário")
+            else:
+                st.session_state.aulas_fixas.append(
+                    AulaFixa(turma_nome, disciplina_nome, professor_nome, dia, horario, sala_nome)
+                )
+                if salvar_tudo():
+                    st.success("✅ Aula fixada!")
+                st.rerun()
+
 # Menu de abas
 abas = st.tabs(["🏠 Início", "📚 Disciplinas", "👩‍🏫 Professores", "🎒 Turmas", "🏫 Salas", "🗓️ Gerar Grade", "👨‍🏫 Grade por Professor"])
 
@@ -188,12 +282,21 @@ with abas[1]:  # ABA DISCIPLINAS
                 grupo = st.selectbox("Grupo*", ["A", "B"])
                 cor_fundo = st.color_picker("Cor de Fundo", "#4A90E2")
                 cor_fonte = st.color_picker("Cor da Fonte", "#FFFFFF")
+                tipo_sala = st.selectbox(
+                    "Tipo de Sala", TIPOS_SALA_DISCIPLINA,
+                    format_func=lambda t: t or "Qualquer"
+                )
+                tamanho_bloco = st.number_input(
+                    "Aulas seguidas por bloco", 1, 3, 1,
+                    help="2 = aulas geminadas; a carga que sobrar vira aula simples"
+                )
             
             if st.form_submit_button("✅ Adicionar Disciplina"):
                 if nome and turmas_selecionadas:
                     try:
                         nova_disciplina = Disciplina(
-                            nome, carga, tipo, turmas_selecionadas, grupo, cor_fundo, cor_fonte
+                            nome, carga, tipo, turmas_selecionadas, grupo, cor_fundo, cor_fonte, tipo_sala,
+                            tamanho_bloco
                         )
                         st.session_state.disciplinas.append(nova_disciplina)
                         if salvar_tudo():
@@ -243,6 +346,16 @@ with abas[1]:  # ABA DISCIPLINAS
                     )
                     nova_cor_fundo = st.color_picker("Cor de Fundo", disc.cor_fundo, key=f"cor_fundo_{disc.id}")
                     nova_cor_fonte = st.color_picker("Cor da Fonte", disc.cor_fonte, key=f"cor_fonte_{disc.id}")
+                    novo_tipo_sala = st.selectbox(
+                        "Tipo de Sala",
+                        TIPOS_SALA_DISCIPLINA,
+                        index=TIPOS_SALA_DISCIPLINA.index(disc.tipo_sala) if disc.tipo_sala in TIPOS_SALA_DISCIPLINA else 0,
+                        format_func=lambda t: t or "Qualquer",
+                        key=f"tipo_sala_{disc.id}"
+                    )
+                    novo_tamanho_bloco = st.number_input(
+                        "Aulas seguidas por bloco", 1, 3, disc.tamanho_bloco, key=f"bloco_{disc.id}"
+                    )
                 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -256,6 +369,8 @@ with abas[1]:  # ABA DISCIPLINAS
                                 disc.grupo = novo_grupo
                                 disc.cor_fundo = nova_cor_fundo
                                 disc.cor_fonte = nova_cor_fonte
+                                disc.tipo_sala = novo_tipo_sala
+                                disc.tamanho_bloco = novo_tamanho_bloco
                                 
                                 if salvar_tudo():
                                     st.success("✅ Disciplina atualizada!")
@@ -415,6 +530,8 @@ with abas[2]:  # ABA PROFESSORES
                             st.rerun()
                         except Exception as e:
                             st.error(f"❌ Erro ao excluir: {str(e)}")
+            
+            editor_aulas_fixas(professor=prof)
 
 with abas[3]:  # ABA TURMAS
     st.header("🎒 Turmas")
@@ -430,6 +547,7 @@ with abas[3]:  # ABA TURMAS
             with col2:
                 turno = st.selectbox("Turno*", ["manha"], disabled=True)
                 grupo = st.selectbox("Grupo*", ["A", "B"])
+                alunos = st.number_input("Número de Alunos", 0, 100, 0, help="0 = não informado")
             
             # Determinar segmento automaticamente
             segmento = "EM" if serie and 'em' in serie.lower() else "EF_II"
@@ -438,7 +556,7 @@ with abas[3]:  # ABA TURMAS
             if st.form_submit_button("✅ Adicionar Turma"):
                 if nome and serie:
                     try:
-                        nova_turma = Turma(nome, serie, "manha", grupo, segmento)
+                        nova_turma = Turma(nome, serie, "manha", grupo, segmento, alunos)
                         st.session_state.turmas.append(nova_turma)
                         if salvar_tudo():
                             st.success(f"✅ Turma '{nome}' adicionada!")
@@ -472,6 +590,9 @@ with abas[3]:  # ABA TURMAS
                         index=0 if obter_grupo_seguro(turma) == "A" else 1,
                         key=f"grupo_turma_{turma.id}"
                     )
+                    novos_alunos = st.number_input(
+                        "Número de Alunos", 0, 100, turma.alunos, key=f"alunos_turma_{turma.id}"
+                    )
                 
                 # Mostrar informações da turma
                 segmento = obter_segmento_turma(turma.nome)
@@ -504,6 +625,7 @@ with abas[3]:  # ABA TURMAS
                                 turma.nome = novo_nome
                                 turma.serie = nova_serie
                                 turma.grupo = novo_grupo
+                                turma.alunos = novos_alunos
                                 
                                 if salvar_tudo():
                                     st.success("✅ Turma atualizada!")
@@ -522,6 +644,8 @@ with abas[3]:  # ABA TURMAS
                             st.rerun()
                         except Exception as e:
                             st.error(f"❌ Erro ao excluir: {str(e)}")
+            
+            editor_aulas_fixas(turma=turma)
 
 with abas[4]:  # ABA SALAS
     st.header("🏫 Salas")
@@ -622,15 +746,154 @@ with abas[5]:  # ABA GERAR GRADE
     with col2:
         tipo_algoritmo = st.selectbox(
             "Algoritmo de Geração",
-            ["Algoritmo Simples (Rápido)", "Google OR-Tools (Otimizado)"]
+            ["Algoritmo Simples (Rápido)", "Google OR-Tools (Otimizado)", "Portfolio (Todos em paralelo)"]
         )
         
+        estrategia_simples = "aleatoria"
+        tempo_reparo = 5.0
+        execucoes_paralelas = 1
+        semente_mestre = 0
+        if tipo_algoritmo == "Algoritmo Simples (Rápido)":
+            estrategias = {
+                "mais_restrita": "Mais restrita primeiro",
+                "aleatoria": "Tentativas aleatórias"
+            }
+            estrategia_simples = st.selectbox(
+                "Estratégia do Algoritmo Simples",
+                list(estrategias),
+                format_func=lambda e: estrategias[e],
+                help="'Mais restrita primeiro' aloca antes as aulas com menos opções de professor/horário"
+            )
+            tempo_reparo = st.number_input(
+                "Tempo de reparo (s)", 0.0, 120.0, 5.0, step=1.0,
+                help="Tempo máximo da busca que tenta encaixar aulas que sobraram (0 desativa)"
+            )
+            execucoes_paralelas = st.number_input(
+                "Execuções paralelas", 1, 64, 1,
+                help="Roda várias sementes em paralelo e fica com a melhor grade"
+            )
+            if execucoes_paralelas > 1:
+                semente_mestre = st.number_input("Semente", 0, 2**31 - 1, 0)
+        elif tipo_algoritmo == "Portfolio (Todos em paralelo)":
+            prazo_portfolio = st.number_input(
+                "Prazo (s)", 1.0, 3600.0, 60.0, step=10.0,
+                help="Tempo máximo da disputa; os algoritmos que não terminarem são cancelados"
+            )
+            aguardar_prazo = st.checkbox(
+                "Esperar o prazo e escolher a melhor grade",
+                value=False,
+                help="Sem esta opção, fica com a primeira grade completa encontrada"
+            )
+        else:
+            with st.expander("⚙️ Parâmetros do OR-Tools", expanded=False):
+                num_search_workers = st.number_input(
+                    "Workers de busca", 1, 64, min(os.cpu_count() or 8, 16),
+                    help="Número de threads usadas pelo CP-SAT"
+                )
+                max_time_in_seconds = st.number_input(
+                    "Tempo limite (s)", 1.0, 3600.0, 60.0, step=10.0,
+                    help="Ao atingir o limite, usa a melhor grade encontrada até então"
+                )
+                relative_gap = st.number_input(
+                    "Gap relativo", 0.0, 1.0, 0.0, step=0.01,
+                    help="Para a busca quando a solução estiver a este gap do ótimo"
+                )
+                log_search_progress = st.checkbox("Log do solver no console", value=False)
+                modos_salas = {
+                    "integrado": "No modelo (CP-SAT escolhe as salas)",
+                    "emparelhamento": "Depois dos horários (emparelhamento)"
+                }
+                modo_salas = st.selectbox(
+                    "Atribuição de salas",
+                    list(modos_salas),
+                    format_func=lambda m: modos_salas[m],
+                    help="Em duas etapas o modelo fica bem menor: primeiro horários, depois salas por horário"
+                )
+                otimizar = st.checkbox(
+                    "Otimizar preferências pedagógicas",
+                    value=False,
+                    help="Horários ideais por tipo de disciplina, menos janelas de professores e menos repetições no dia"
+                )
+                pesos = None
+                if otimizar:
+                    col_p1, col_p2, col_p3 = st.columns(3)
+                    with col_p1:
+                        peso_horario = st.number_input("Peso horário não ideal", 0, 20, PESOS_PADRAO["horario_nao_ideal"])
+                    with col_p2:
+                        peso_janela = st.number_input("Peso janela de professor", 0, 20, PESOS_PADRAO["janela_professor"])
+                    with col_p3:
+                        peso_repeticao = st.number_input("Peso repetição no dia", 0, 20, PESOS_PADRAO["repeticao_dia"])
+                    pesos = {
+                        "horario_nao_ideal": peso_horario,
+                        "janela_professor": peso_janela,
+                        "repeticao_dia": peso_repeticao
+                    }
+                decompor_grade = st.checkbox(
+                    "Decompor em componentes independentes",
+                    value=False,
+                    help="Resolve em paralelo grupos de turmas que não compartilham professores"
+                )
+                ponto_partida = st.selectbox(
+                    "Ponto de partida",
+                    ["Nenhum", "Grade atual", "Algoritmo simples"],
+                    help="Usa uma grade existente como dica para o solver"
+                )
+                alteradas = None
+                if ponto_partida == "Grade atual":
+                    nomes_editaveis = (
+                        [t.nome for t in st.session_state.turmas] +
+                        [p.nome for p in st.session_state.professores]
+                    )
+                    alteradas_selecionadas = st.multiselect(
+                        "Turmas/professores alterados",
+                        nomes_editaveis,
+                        help="Se preenchido, as aulas que não envolvem estes itens ficam fixas"
+                    )
+                    alteradas = set(alteradas_selecionadas) if alteradas_selecionadas else None
+        
         dias_em_estendido = st.multiselect(
             "Dias EM até 13:10",
             DIAS_SEMANA,
             default=["ter", "qui"],
             help="Dias que o Ensino Médio terá aula até 13:10"
         )
+        usar_cache = st.checkbox(
+            "Usar cache de grades",
+            value=True,
+            help="Reaproveita a grade já gerada com os mesmos dados e parâmetros"
+        )
+    
+    # Parâmetros que, junto com os dados, identificam a grade no cache
+    if tipo_algoritmo == "Google OR-Tools (Otimizado)":
+        parametros_grade = {
+            "algoritmo": "ortools",
+            "num_search_workers": int(num_search_workers),
+            "max_time_in_seconds": max_time_in_seconds,
+            "relative_gap": relative_gap,
+            "modo_salas": modo_salas,
+            "otimizar": otimizar,
+            "pesos": pesos,
+            "decompor_grade": decompor_grade,
+            "ponto_partida": ponto_partida,
+            "grade_inicial": (st.session_state.grade_gerada or []) if ponto_partida == "Grade atual" else [],
+            "alteradas": sorted(alteradas) if alteradas else None
+        }
+    elif tipo_algoritmo == "Portfolio (Todos em paralelo)":
+        parametros_grade = {
+            "algoritmo": "portfolio",
+            "prazo": prazo_portfolio,
+            "aguardar_prazo": aguardar_prazo
+        }
+    else:
+        parametros_grade = {
+            "algoritmo": "simples",
+            "estrategia": estrategia_simples,
+            "tempo_reparo": tempo_reparo,
+            "execucoes_paralelas": int(execucoes_paralelas),
+            "semente": int(semente_mestre)
+        }
+    parametros_grade["dias_em_estendido"] = sorted(dias_em_estendido)
+    parametros_grade["aulas_fixas"] = st.session_state.aulas_fixas
     
     st.subheader("📊 Pré-análise de Viabilidade")
     
@@ -679,6 +942,20 @@ with abas[5]:  # ABA GERAR GRADE
         if aulas_turma > carga_maxima:
             problemas_carga.append(f"{turma.nome} [{grupo_turma}]: {aulas_turma}h > {carga_maxima}h máximo")
     
+    if tipo_grade == "Grade por Grupo A":
+        professores_filtrados = [p for p in st.session_state.professores 
+                               if obter_grupo_seguro(p) in ["A", "AMBOS"]]
+    elif tipo_grade == "Grade por Grupo B":
+        professores_filtrados = [p for p in st.session_state.professores 
+                               if obter_grupo_seguro(p) in ["B", "AMBOS"]]
+    else:
+        professores_filtrados = st.session_state.professores
+    
+    # Gargalos de professores e salas (fluxo máximo)
+    problemas_viabilidade = verificar_viabilidade(
+        turmas_filtradas, professores_filtrados, disciplinas_filtradas, st.session_state.salas
+    )
+    
     # ✅ CAPACIDADE COM HORÁRIOS REAIS
     capacidade_total = 0
     for turma in turmas_filtradas:
@@ -698,6 +975,11 @@ with abas[5]:  # ABA GERAR GRADE
         for problema in problemas_carga:
             st.write(f"- {problema}")
     
+    if problemas_viabilidade:
+        st.warning("⚠️ Gargalos que impedem a grade completa:")
+        for problema in problemas_viabilidade:
+            st.write(f"- {problema}")
+    
     if total_aulas == 0:
         st.error("❌ Nenhuma aula para alocar! Verifique se as disciplinas estão vinculadas às turmas corretas.")
     elif total_aulas > capacidade_total:
@@ -705,7 +987,13 @@ with abas[5]:  # ABA GERAR GRADE
     elif problemas_carga:
         st.error("❌ Corrija os problemas de carga horária antes de gerar a grade!")
     else:
-        st.success("✅ Capacidade suficiente para gerar grade!")
+        if problemas_viabilidade:
+            st.warning(
+                "⚠️ Com esses gargalos a grade sairá parcial: as aulas que não couberem "
+                "aparecem no relatório com o motivo."
+            )
+        else:
+            st.success("✅ Capacidade suficiente para gerar grade!")
         
         if st.button("🚀 Gerar Grade Horária", type="primary", use_container_width=True):
             if not turmas_filtradas:
@@ -717,39 +1005,149 @@ with abas[5]:  # ABA GERAR GRADE
             else:
                 with st.spinner(f"Gerando grade para {grupo_texto}..."):
                     try:
-                        if tipo_grade == "Grade por Grupo A":
-                            professores_filtrados = [p for p in st.session_state.professores 
-                                                   if obter_grupo_seguro(p) in ["A", "AMBOS"]]
-                        elif tipo_grade == "Grade por Grupo B":
-                            professores_filtrados = [p for p in st.session_state.professores 
-                                                   if obter_grupo_seguro(p) in ["B", "AMBOS"]]
-                        else:
-                            professores_filtrados = st.session_state.professores
+                        # Hash dos dados e parâmetros: só no clique, não a cada rerun da aba
+                        chave_grade = chave_instancia(
+                            turmas_filtradas, professores_filtrados, disciplinas_filtradas,
+                            st.session_state.salas, parametros_grade
+                        )
+                        resultado = buscar_grade(chave_grade) if usar_cache else None
+                        st.session_state.cache_grade = "hit" if resultado else "miss"
+                        relatorio = None
                         
-                        # ✅ PASSAR DIAS EM ESTENDIDO para o scheduler
-                        if tipo_algoritmo == "Google OR-Tools (Otimizado)":
-                            scheduler = GradeHorariaORTools(
-                                turmas_filtradas,
-                                professores_filtrados,
-                                disciplinas_filtradas,
-                                st.session_state.salas,
-                                dias_em_estendido=dias_em_estendido
-                            )
-                        else:
-                            scheduler = SimpleGradeHoraria(
-                                turmas_filtradas,
-                                professores_filtrados,
-                                disciplinas_filtradas,
-                                st.session_state.salas,
-                                dias_em_estendido=dias_em_estendido
-                            )
+                        if resultado is None:
+                            # ✅ PASSAR DIAS EM ESTENDIDO para o scheduler
+                            if tipo_algoritmo == "Google OR-Tools (Otimizado)":
+                                progresso_placeholder = st.empty()
+                                contexto_script = get_script_run_ctx()
+                                
+                                def mostrar_progresso(progresso):
+                                    # O callback roda em uma thread do solver
+                                    add_script_run_ctx(threading.current_thread(), contexto_script)
+                                    progresso_placeholder.info(
+                                        f"🔎 Solução {progresso['solucoes']} - "
+                                        f"objetivo {progresso['objetivo']:.0f}, "
+                                        f"limite {progresso['limite']:.0f} "
+                                        f"({progresso['tempo']:.1f}s)"
+                                    )
+                                
+                                grade_inicial = None
+                                if ponto_partida == "Grade atual":
+                                    grade_inicial = st.session_state.grade_gerada
+                                elif ponto_partida == "Algoritmo simples":
+                                    grade_inicial = SimpleGradeHoraria(
+                                        turmas_filtradas,
+                                        professores_filtrados,
+                                        disciplinas_filtradas,
+                                        st.session_state.salas,
+                                        dias_em_estendido=dias_em_estendido,
+                                        aulas_fixas=st.session_state.aulas_fixas,
+                                        estrategia="mais_restrita",
+                                        exibir_avisos=False
+                                    ).gerar_grade()
+                                
+                                scheduler = GradeHorariaORTools(
+                                    turmas_filtradas,
+                                    professores_filtrados,
+                                    disciplinas_filtradas,
+                                    st.session_state.salas,
+                                    dias_em_estendido=dias_em_estendido,
+                                    aulas_fixas=st.session_state.aulas_fixas,
+                                    grade_inicial=grade_inicial,
+                                    alteradas=alteradas,
+                                    modo_salas=modo_salas,
+                                    otimizar=otimizar,
+                                    pesos=pesos,
+                                    num_search_workers=int(num_search_workers),
+                                    max_time_in_seconds=max_time_in_seconds,
+                                    relative_gap=relative_gap,
+                                    log_search_progress=log_search_progress,
+                                    callback_progresso=mostrar_progresso
+                                )
+                            elif tipo_algoritmo == "Portfolio (Todos em paralelo)":
+                                scheduler = PortfolioGrade(
+                                    turmas_filtradas,
+                                    professores_filtrados,
+                                    disciplinas_filtradas,
+                                    st.session_state.salas,
+                                    dias_em_estendido=dias_em_estendido,
+                                    aulas_fixas=st.session_state.aulas_fixas,
+                                    prazo=prazo_portfolio,
+                                    aguardar_prazo=aguardar_prazo,
+                                    num_search_workers=min(os.cpu_count() or 8, 16),
+                                    exibir_avisos=False
+                                )
+                            else:
+                                scheduler = SimpleGradeHoraria(
+                                    turmas_filtradas,
+                                    professores_filtrados,
+                                    disciplinas_filtradas,
+                                    st.session_state.salas,
+                                    dias_em_estendido=dias_em_estendido,
+                                    aulas_fixas=st.session_state.aulas_fixas,
+                                    estrategia=estrategia_simples,
+                                    tempo_reparo=tempo_reparo,
+                                    exibir_avisos=False
+                                )
                         
-                        resultado = scheduler.gerar_grade()
+                            if isinstance(scheduler, SimpleGradeHoraria) and execucoes_paralelas > 1:
+                                resultado = scheduler.gerar_grade_paralela(
+                                    execucoes=int(execucoes_paralelas),
+                                    semente=int(semente_mestre)
+                                )
+                            elif isinstance(scheduler, GradeHorariaORTools) and decompor_grade:
+                                resultado = scheduler.gerar_grade_decomposta()
+                            else:
+                                # Anytime: grade parcial com as aulas que faltaram e o motivo
+                                relatorio = scheduler.gerar_resultado()
+                                resultado = relatorio.aulas or None
+                            
+                            # Multi-start e decomposição: mesmo relatório de aulas faltantes
+                            if relatorio is None and resultado:
+                                if isinstance(scheduler, SimpleGradeHoraria):
+                                    estatisticas = {
+                                        "algoritmo": "simples",
+                                        "estrategia": scheduler.estrategia,
+                                        "execucoes": int(execucoes_paralelas),
+                                        "semente": scheduler.semente
+                                    }
+                                    motivo = "Nenhum horário livre em comum para turma, professor e sala"
+                                else:
+                                    estatisticas = {"algoritmo": "ortools", **scheduler.estatisticas}
+                                    motivo = "Conflito com as outras aulas da turma, dos professores e das salas"
+                                relatorio = montar_resultado(
+                                    resultado, turmas_filtradas, professores_filtrados,
+                                    disciplinas_filtradas, st.session_state.salas, estatisticas, motivo
+                                )
+                            
+                            # Grades incompletas não vão para o cache
+                            if resultado and relatorio.completa:
+                                guardar_grade(chave_grade, resultado)
+                            
+                            if isinstance(scheduler, PortfolioGrade) and resultado:
+                                vencedor = scheduler.estatisticas["vencedor"]
+                                st.info(
+                                    f"🏁 Grade escolhida: {MOTORES[vencedor]} "
+                                    f"({scheduler.estatisticas['tempo_vencedor']:.1f}s)"
+                                )
                         
                         if resultado:
                             st.session_state.grade_gerada = resultado
                             st.session_state.turmas_grade = turmas_filtradas
-                            st.success(f"✅ Grade gerada com sucesso para {len(turmas_filtradas)} turmas!")
+                            st.session_state.relatorio_grade = relatorio
+                            if st.session_state.cache_grade == "miss":
+                                salvar_versao(
+                                    resultado, [t.nome for t in turmas_filtradas], chave_grade,
+                                    parametros_grade["algoritmo"], relatorio.estatisticas
+                                )
+                            if relatorio is not None and not relatorio.completa:
+                                st.warning(
+                                    f"⚠️ Grade parcial: {len(resultado)} aulas alocadas e "
+                                    f"{len(relatorio.nao_alocadas)} não alocadas (veja o relatório abaixo)"
+                                )
+                            elif st.session_state.cache_grade == "hit":
+                                st.success(f"⚡ Grade recuperada do cache para {len(turmas_filtradas)} turmas (cache hit)")
+                            else:
+                                st.success(f"✅ Grade gerada com sucesso para {len(turmas_filtradas)} turmas! (cache miss)")
                         else:
                             st.error("❌ Não foi possível gerar uma grade válida!")
                             
@@ -757,6 +1155,59 @@ with abas[5]:  # ABA GERAR GRADE
                         st.error(f"❌ Erro ao gerar grade: {str(e)}")
                         st.code(traceback.format_exc())
     
+    # Versões salvas das grades geradas
+    versoes = listar_versoes()
+    if versoes:
+        with st.expander(f"🗂️ Versões salvas ({len(versoes)})", expanded=False):
+            st.dataframe(pd.DataFrame([
+                {
+                    "Versão": versao["versao"],
+                    "Data": pd.to_datetime(versao["criada_em"], unit="s").strftime("%d/%m/%Y %H:%M"),
+                    "Algoritmo": versao["algoritmo"],
+                    "Aulas": versao["total_aulas"],
+                    "Turmas": len(versao["turmas"]),
+                    "Dados": (versao["chave_instancia"] or "")[:8]
+                }
+                for versao in versoes
+            ]), use_container_width=True, hide_index=True)
+            
+            numeros = [versao["versao"] for versao in versoes]
+            col_v1, col_v2 = st.columns(2)
+            with col_v1:
+                versao_carregar = st.selectbox("Versão para abrir", numeros)
+                if st.button("📂 Abrir versão", use_container_width=True):
+                    aulas_versao, turmas_versao = carregar_versao(versao_carregar)
+                    st.session_state.grade_gerada = aulas_versao
+                    st.session_state.turmas_grade = [
+                        t for t in st.session_state.turmas if t.nome in turmas_versao
+                    ]
+                    st.session_state.relatorio_grade = None
+                    st.rerun()
+            with col_v2:
+                versao_antiga = st.selectbox("Comparar versão", numeros, index=min(1, len(numeros) - 1))
+                versao_nova = st.selectbox("com a versão", numeros)
+                if st.button("🔍 Comparar", use_container_width=True):
+                    diferencas = comparar_versoes(versao_antiga, versao_nova)
+                    st.write(
+                        f"➕ {len(diferencas['adicionadas'])} aulas novas | "
+                        f"➖ {len(diferencas['removidas'])} removidas | "
+                        f"✏️ {len(diferencas['alteradas'])} alteradas"
+                    )
+                    linhas_diferenca = [
+                        {"Turma": a.turma, "Dia": a.dia, "Horário": a.horario, "Antes": "", "Depois": f"{a.disciplina} - {a.professor}"}
+                        for a in diferencas["adicionadas"]
+                    ] + [
+                        {"Turma": a.turma, "Dia": a.dia, "Horário": a.horario, "Antes": f"{a.disciplina} - {a.professor}", "Depois": ""}
+                        for a in diferencas["removidas"]
+                    ] + [
+                        {"Turma": antes.turma, "Dia": antes.dia, "Horário": antes.horario,
+                         "Antes": f"{antes.disciplina} - {antes.professor} ({antes.sala})",
+                         "Depois": f"{depois.disciplina} - {depois.professor} ({depois.sala})"}
+                        for antes, depois in diferencas["alteradas"]
+                    ]
+                    if linhas_diferenca:
+                        st.dataframe(pd.DataFrame(linhas_diferenca), use_container_width=True, hide_index=True)
+    
     # Exibir grade gerada
     if "grade_gerada" in st.session_state and st.session_state.grade_gerada:
         st.subheader("📅 Grade Horária Gerada")
@@ -792,6 +1243,81 @@ with abas[5]:  # ABA GERAR GRADE
                     )
                 except Exception as e:
                     st.error(f"❌ Erro ao exportar: {str(e)}")
+
+        with st.expander("🔧 Otimizar grade atual", expanded=False):
+            st.caption(
+                "Libera as aulas de um dia, professor ou turma por vez e resolve de novo "
+                "só essa parte, mantendo o resto da grade fixo."
+            )
+            col_lns1, col_lns2, col_lns3 = st.columns(3)
+            with col_lns1:
+                tempo_total_lns = st.number_input("Tempo total (s)", 5.0, 3600.0, 60.0, step=10.0)
+            with col_lns2:
+                tempo_vizinhanca_lns = st.number_input("Tempo por vizinhança (s)", 0.5, 60.0, 5.0, step=0.5)
+            with col_lns3:
+                semente_lns = st.number_input("Semente da busca", 0, 2**31 - 1, 0)
+
+            if st.button("🔧 Otimizar grade atual", use_container_width=True):
+                progresso_lns = st.empty()
+                contexto_lns = get_script_run_ctx()
+
+                def mostrar_progresso_lns(progresso):
+                    add_script_run_ctx(threading.current_thread(), contexto_lns)
+                    progresso_lns.info(
+                        f"🔎 Iteração {progresso['iteracao']} ({progresso['vizinhanca']}) - "
+                        f"objetivo {progresso['objetivo']:.0f} ({progresso['tempo']:.1f}s)"
+                    )
+
+                turmas_lns = st.session_state.turmas_grade or turmas_filtradas
+                otimizador = GradeHorariaORTools(
+                    turmas_lns,
+                    st.session_state.professores,
+                    st.session_state.disciplinas,
+                    st.session_state.salas,
+                    dias_em_estendido=dias_em_estendido,
+                    aulas_fixas=st.session_state.aulas_fixas,
+                    num_search_workers=min(os.cpu_count() or 8, 16),
+                    callback_progresso=mostrar_progresso_lns
+                )
+                with st.spinner("Otimizando grade..."):
+                    grade_melhorada = otimizador.melhorar_grade(
+                        st.session_state.grade_gerada,
+                        tempo_total=tempo_total_lns,
+                        tempo_vizinhanca=tempo_vizinhanca_lns,
+                        semente=int(semente_lns)
+                    )
+                if grade_melhorada:
+                    st.session_state.grade_gerada = grade_melhorada
+                    st.session_state.relatorio_grade = montar_resultado(
+                        grade_melhorada, turmas_lns, st.session_state.professores,
+                        st.session_state.disciplinas, st.session_state.salas,
+                        otimizador.estatisticas, "Conflito com as outras aulas da turma, dos professores e das salas"
+                    )
+                    estatisticas = otimizador.estatisticas
+                    salvar_versao(
+                        grade_melhorada, [t.nome for t in turmas_lns], None, "lns", estatisticas
+                    )
+                    st.success(
+                        f"✅ Objetivo de {estatisticas['objetivo_inicial']:.0f} para "
+                        f"{estatisticas['objetivo']:.0f} em {estatisticas['iteracoes']} iterações"
+                    )
+
+        # Relatório de aulas não alocadas da última geração
+        relatorio = st.session_state.get("relatorio_grade")
+        if relatorio is not None and relatorio.nao_alocadas:
+            with st.expander(f"⚠️ {len(relatorio.nao_alocadas)} aulas não alocadas", expanded=True):
+                df_faltantes = pd.DataFrame([
+                    {"Turma": aula.turma, "Disciplina": aula.disciplina, "Motivo": aula.motivo}
+                    for aula in relatorio.nao_alocadas
+                ])
+                resumo = df_faltantes.groupby(["Turma", "Disciplina", "Motivo"]).size().reset_index(name="Aulas")
+                st.dataframe(resumo, use_container_width=True)
+                if relatorio.estatisticas:
+                    st.caption(" | ".join(
+                        f"{chave}: {valor:.1f}" if isinstance(valor, float) else f"{chave}: {valor}"
+                        for chave, valor in relatorio.estatisticas.items()
+                        if not isinstance(valor, dict)
+                    ))
         
         # Exibir grade por turma
         turmas_grade = st.session_state.turmas_grade if "turmas_grade" in st.session_state else turmas_filtradas
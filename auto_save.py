@@ -1,29 +1,204 @@
-from database import salvar_disciplinas, salvar_professores, salvar_turmas, salvar_salas
+import hashlib
+import json
+import threading
+from database import salvar_alteracoes, _REGISTROS
 import streamlit as st
 
-def salvar_tudo():
-    """Salva todos os dados no banco"""
+# Coleções do session_state que são gravadas no banco
+ENTIDADES = ("disciplinas", "professores", "turmas", "salas", "aulas_fixas")
+
+# Nome de cada entidade nas mensagens de conflito
+ROTULOS = {
+    "disciplinas": "Disciplina",
+    "professores": "Professor",
+    "turmas": "Turma",
+    "salas": "Sala",
+    "aulas_fixas": "Aula fixa"
+}
+
+def _assinatura(chave, item):
+    """Resumo do conteúdo de um item, para saber se mudou desde a última gravação
+    
+    Usa o registro do banco, que ordena os conjuntos, e não o repr: a ordem
+    de um set pode mudar de uma execução para outra.
+    """
+    registro = json.dumps(_REGISTROS[chave](item), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(registro.encode('utf-8')).hexdigest()
+
+def _assinaturas(chave, itens):
+    """Resumo de cada item da coleção: {id: hash}"""
+    return {item.id: _assinatura(chave, item) for item in itens}
+
+def _descrever(item):
+    """Nome do item nas mensagens de conflito"""
+    if hasattr(item, "nome"):
+        return item.nome
+    return f"{item.turma} - {item.disciplina} ({item.dia}, {item.horario}º)"
+
+def registrar_estado_salvo(versoes=None):
+    """Marca as coleções atuais como iguais ao banco (chamado após carregar)
+    
+    `versoes` são as versões de cada registro no banco quando foi carregado,
+    {entidade: {id: versão}}; um registro desta sessão só é gravado se o
+    banco ainda estiver nessa versão dele.
+    """
+    st.session_state.assinaturas_salvas = {
+        chave: _assinaturas(chave, st.session_state[chave])
+        for chave in ENTIDADES if chave in st.session_state
+    }
+    st.session_state.versoes_banco = (
+        {chave: dict(ids) for chave, ids in versoes.items()} if versoes is not None else None
+    )
+
+def entidades_alteradas(colecoes, salvas):
+    """Itens que mudaram desde a última gravação
+    
+    Retorna {chave: (itens alterados ou novos, ids removidos, assinaturas atuais)}
+    só para as coleções com alguma diferença.
+    """
+    alteradas = {}
+    for chave, itens in colecoes.items():
+        atuais = _assinaturas(chave, itens)
+        anteriores = salvas.get(chave, {})
+        alterados = [item for item in itens if anteriores.get(item.id) != atuais[item.id]]
+        removidos = [id_ for id_ in anteriores if id_ not in atuais]
+        if alterados or removidos:
+            alteradas[chave] = (alterados, removidos, atuais)
+    return alteradas
+
+def _resolver_conflitos(colecoes, salvas, versoes, conflitos):
+    """Troca os itens em conflito pela versão atual do banco e retorna a descrição de cada um
+    
+    Assim a sessão volta a concordar com o banco nesses itens e as próximas
+    gravações não os reenviam.
+    """
+    descricoes = []
+    for chave, por_id in conflitos.items():
+        itens = colecoes[chave]
+        for id_, (versao, objeto) in por_id.items():
+            posicao = next((i for i, item in enumerate(itens) if item.id == id_), None)
+            local = itens[posicao] if posicao is not None else None
+            descricoes.append(f"{ROTULOS[chave]} {_descrever(local or objeto)}")
+            if objeto is None:
+                # Excluído por outra sessão
+                if posicao is not None:
+                    del itens[posicao]
+                salvas[chave].pop(id_, None)
+                if versoes is not None:
+                    versoes[chave].pop(id_, None)
+                continue
+            if posicao is None:
+                itens.append(objeto)
+            else:
+                itens[posicao] = objeto
+            salvas[chave][id_] = _assinatura(chave, objeto)
+            if versoes is not None:
+                versoes[chave][id_] = versao
+    return descricoes
+
+def _gravar(colecoes, salvas, versoes, conflitos_pendentes):
+    """Grava os itens alterados de uma só vez e atualiza assinaturas e versões salvas
+    
+    Itens que outra sessão alterou ou excluiu depois do carregamento não são
+    gravados: os conflitos ({entidade: {id: (versão, objeto)}}) vão para
+    `conflitos_pendentes`, sem mexer nas coleções, que podem estar em uso
+    pela execução da página quando a gravação é adiada.
+    """
+    alteradas = entidades_alteradas(colecoes, salvas)
+    if not alteradas:
+        return True
+    resultado = salvar_alteracoes(
+        {chave: (alterados, removidos) for chave, (alterados, removidos, _) in alteradas.items()},
+        versoes
+    )
+    if resultado is None:
+        return False
+    for chave, (_, removidos, atuais) in alteradas.items():
+        gravadas = resultado["versoes"].get(chave, {})
+        salvas_chave = salvas.setdefault(chave, {})
+        for id_, versao in gravadas.items():
+            salvas_chave[id_] = atuais[id_]
+            if versoes is not None:
+                versoes.setdefault(chave, {})[id_] = versao
+        for id_ in removidos:
+            if id_ not in resultado["conflitos"].get(chave, {}):
+                salvas_chave.pop(id_, None)
+                if versoes is not None:
+                    versoes.get(chave, {}).pop(id_, None)
+    if resultado["conflitos"]:
+        conflitos_pendentes.append(resultado["conflitos"])
+    return True
+
+def _aplicar_conflitos_pendentes():
+    """Resolve os conflitos anotados pelas gravações, na thread da página"""
+    pendentes = st.session_state.get("conflitos_pendentes")
+    if not pendentes:
+        return
+    colecoes = {chave: st.session_state[chave] for chave in ENTIDADES if chave in st.session_state}
+    salvas = st.session_state.setdefault("assinaturas_salvas", {})
+    versoes = st.session_state.get("versoes_banco")
+    descricoes = st.session_state.setdefault("conflitos_salvamento", [])
+    while pendentes:
+        descricoes.extend(_resolver_conflitos(colecoes, salvas, versoes, pendentes.pop(0)))
+
+def mostrar_conflitos_salvamento():
+    """Aplica os conflitos de gravação pendentes e avisa, uma vez, dos itens que não foram salvos
+    
+    Chamada no início de cada execução da página, onde é seguro trocar os
+    itens das coleções do session_state.
+    """
+    _aplicar_conflitos_pendentes()
+    conflitos = st.session_state.get("conflitos_salvamento")
+    if conflitos:
+        st.warning(
+            f"⚠️ Alterações não salvas: {', '.join(conflitos)} "
+            f"{'foi alterado' if len(conflitos) == 1 else 'foram alterados'} por outra sessão. "
+            "A versão atual do banco foi carregada; refaça a edição se ainda for necessária."
+        )
+        conflitos.clear()
+
+def salvar_tudo(atraso=0.0):
+    """Salva no banco só os itens alterados, numa única gravação atômica
+    
+    Com `atraso` > 0 a gravação é adiada por esse número de segundos e
+    reagendada a cada nova chamada, juntando edições seguidas em uma só.
+    Itens que outra sessão alterou depois do carregamento não são gravados:
+    voltam à versão do banco (na hora, ou na próxima execução da página se
+    a gravação for adiada) e o conflito aparece na próxima execução da
+    página (mostrar_conflitos_salvamento).
+    """
     try:
-        success = True
+        salvas = st.session_state.setdefault("assinaturas_salvas", {})
+        versoes = st.session_state.get("versoes_banco")
+        # A thread da gravação adiada só acrescenta nesta lista
+        conflitos = st.session_state.setdefault("conflitos_pendentes", [])
+        
+        temporizador = st.session_state.get("temporizador_salvamento")
+        if temporizador is not None:
+            temporizador.cancel()
+            st.session_state.temporizador_salvamento = None
+        
+        # As listas são as mesmas do session_state: a gravação adiada pega o estado mais recente
+        colecoes = {chave: st.session_state[chave] for chave in ENTIDADES if chave in st.session_state}
+        
+        if atraso > 0:
+            def gravar_adiado():
+                try:
+                    if not _gravar(colecoes, salvas, versoes, conflitos):
+                        print("Erro ao salvar alterações adiadas")
+                except Exception as e:
+                    print(f"Erro ao salvar alterações adiadas: {e}")
+            
+            temporizador = threading.Timer(atraso, gravar_adiado)
+            temporizador.daemon = True
+            temporizador.start()
+            st.session_state.temporizador_salvamento = temporizador
+            return True
         
-        if 'disciplinas' in st.session_state:
-            if not salvar_disciplinas(st.session_state.disciplinas):
-                success = False
-                
-        if 'professores' in st.session_state:
-            if not salvar_professores(st.session_state.professores):
-                success = False
-                
-        if 'turmas' in st.session_state:
-            if not salvar_turmas(st.session_state.turmas):
-                success = False
-                
-        if 'salas' in st.session_state:
-            if not salvar_salas(st.session_state.salas):
-                success = False
-                
-        return success
+        gravou = _gravar(colecoes, salvas, versoes, conflitos)
+        _aplicar_conflitos_pendentes()
+        return gravou
         
     except Exception as e:
         print(f"Erro ao salvar tudo: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,191 @@
+import json
+import sqlite3
+
+# Arquivo do banco SQLite (backend alternativo ao escola_db.json)
+SQLITE_FILE = "escola_db.sqlite"
+
+# Tabela -> (colunas além do id, colunas guardadas como texto JSON, colunas indexadas)
+TABELAS = {
+    "disciplinas": (
+        ("nome", "carga_semanal", "tipo", "turmas", "grupo", "cor_fundo", "cor_fonte",
+         "tipo_sala", "tamanho_bloco"),
+        {"turmas"},
+        ("nome", "grupo")
+    ),
+    "professores": (
+        ("nome", "disciplinas", "disponibilidade", "grupo", "horarios_indisponiveis"),
+        {"disciplinas", "disponibilidade", "horarios_indisponiveis"},
+        ("nome", "grupo")
+    ),
+    "turmas": (
+        ("nome", "serie", "turno", "grupo", "segmento", "alunos"),
+        set(),
+        ("nome", "grupo")
+    ),
+    "salas": (
+        ("nome", "capacidade", "tipo"),
+        set(),
+        ("nome",)
+    ),
+    "aulas_fixas": (
+        ("turma", "disciplina", "professor", "dia", "horario", "sala"),
+        set(),
+        ("turma", "professor")
+    )
+}
+
+def conectar():
+    """Abre o banco e cria as tabelas e índices que faltarem"""
+    # Espera outras sessões terminarem de gravar em vez de falhar na hora
+    conexao = sqlite3.connect(SQLITE_FILE, timeout=30)
+    with conexao:
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS versoes_registros "
+            "(tabela TEXT, id TEXT, versao INTEGER, PRIMARY KEY (tabela, id))"
+        )
+        for tabela, (colunas, _, indexadas) in TABELAS.items():
+            conexao.execute(
+                f"CREATE TABLE IF NOT EXISTS {tabela} (id TEXT PRIMARY KEY, {', '.join(colunas)})"
+            )
+            for coluna in indexadas:
+                conexao.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{coluna} ON {tabela} ({coluna})"
+                )
+    return conexao
+
+def _linha(tabela, registro):
+    """Tupla (id, colunas...) do registro, com listas serializadas em JSON"""
+    colunas, colunas_json, _ = TABELAS[tabela]
+    valores = [
+        json.dumps(registro.get(coluna, []), ensure_ascii=False) if coluna in colunas_json
+        else registro.get(coluna)
+        for coluna in colunas
+    ]
+    return (registro["id"], *valores)
+
+def _registro(tabela, linha):
+    """Dicionário do registro a partir da linha (id, colunas...)"""
+    colunas, colunas_json, _ = TABELAS[tabela]
+    registro = {"id": linha[0]}
+    for coluna, valor in zip(colunas, linha[1:]):
+        if valor is None:
+            continue  # Campo ausente no registro migrado: vale o padrão do modelo
+        registro[coluna] = json.loads(valor) if coluna in colunas_json else valor
+    return registro
+
+def _ler_tabela(conexao, tabela):
+    """Registros da tabela como dicionários, na ordem de cadastro"""
+    colunas, _, _ = TABELAS[tabela]
+    cursor = conexao.execute(f"SELECT id, {', '.join(colunas)} FROM {tabela} ORDER BY rowid")
+    return [_registro(tabela, linha) for linha in cursor]
+
+def _ler_versoes(conexao, tabela):
+    """Versão de cada registro da tabela: {id: número de gravações}
+
+    Registros sem versão gravada (migrados ou de antes do controle de
+    versões) valem 1; 0 é reservado para "não existe".
+    """
+    return dict(conexao.execute(
+        f"SELECT t.id, COALESCE(v.versao, 1) FROM {tabela} t "
+        "LEFT JOIN versoes_registros v ON v.tabela = ? AND v.id = t.id",
+        (tabela,)
+    ))
+
+def _versao_atual(conexao, tabela, id_):
+    """(versão, registro) atuais de um id, ou (0, None) se ele não existe mais"""
+    colunas, _, _ = TABELAS[tabela]
+    linha = conexao.execute(
+        f"SELECT id, {', '.join(colunas)} FROM {tabela} WHERE id = ?", (id_,)
+    ).fetchone()
+    if linha is None:
+        return 0, None
+    versao = conexao.execute(
+        "SELECT versao FROM versoes_registros WHERE tabela = ? AND id = ?", (tabela, id_)
+    ).fetchone()
+    return (versao[0] if versao else 1), _registro(tabela, linha)
+
+def carregar_registros(tabela):
+    """Registros da tabela como dicionários, na ordem de cadastro"""
+    conexao = conectar()
+    try:
+        return _ler_tabela(conexao, tabela)
+    finally:
+        conexao.close()
+
+def carregar_lote():
+    """Todas as tabelas lidas numa mesma transação: ({tabela: registros}, {tabela: {id: versão}})"""
+    conexao = conectar()
+    try:
+        with conexao:
+            conexao.execute("BEGIN")
+            registros = {tabela: _ler_tabela(conexao, tabela) for tabela in TABELAS}
+            return registros, {tabela: _ler_versoes(conexao, tabela) for tabela in TABELAS}
+    finally:
+        conexao.close()
+
+def salvar_lote(alteracoes, versoes_esperadas=None):
+    """Grava as alterações {tabela: (registros gravados, ids removidos)} numa única transação
+
+    Só as linhas informadas são tocadas: upsert dos registros gravados
+    (os já existentes mantêm o rowid, e portanto a posição na listagem;
+    os novos entram no fim) e remoção dos ids removidos.
+    A transação começa com a trava de escrita (BEGIN IMMEDIATE), então a
+    conferência das versões e a gravação não se intercalam com outra sessão.
+    Com `versoes_esperadas` ({tabela: {id: versão}}, 0 para registros novos),
+    um registro cuja versão no banco é outra fica de fora e volta em
+    "conflitos" com seu conteúdo atual; os demais são gravados.
+    Retorna {"versoes": {tabela: {id: nova versão}}, "conflitos":
+    {tabela: {id: (versão, registro ou None se excluído)}}}, ou None em
+    caso de erro.
+    """
+    conexao = conectar()
+    try:
+        resultado = {"versoes": {}, "conflitos": {}}
+        with conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            for tabela, (gravados, removidos) in alteracoes.items():
+                ids = [registro["id"] for registro in gravados] + list(removidos)
+                atuais = {id_: _versao_atual(conexao, tabela, id_) for id_ in ids}
+                if versoes_esperadas is not None:
+                    esperadas = versoes_esperadas.get(tabela, {})
+                    conflitos = {
+                        id_: atual for id_, atual in atuais.items()
+                        if atual[0] != esperadas.get(id_, 0)
+                    }
+                    if conflitos:
+                        resultado["conflitos"][tabela] = conflitos
+                        gravados = [registro for registro in gravados if registro["id"] not in conflitos]
+                        removidos = [id_ for id_ in removidos if id_ not in conflitos]
+                
+                _gravar_tabela(conexao, tabela, gravados, removidos)
+                versoes = {registro["id"]: atuais[registro["id"]][0] + 1 for registro in gravados}
+                conexao.executemany(
+                    "INSERT INTO versoes_registros (tabela, id, versao) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tabela, id) DO UPDATE SET versao = excluded.versao",
+                    [(tabela, id_, versao) for id_, versao in versoes.items()]
+                )
+                conexao.executemany(
+                    "DELETE FROM versoes_registros WHERE tabela = ? AND id = ?",
+                    [(tabela, id_) for id_ in removidos]
+                )
+                resultado["versoes"][tabela] = versoes
+        return resultado
+    except Exception as e:
+        print(f"Erro ao salvar {', '.join(alteracoes)} no SQLite: {e}")
+        return None
+    finally:
+        conexao.close()
+
+def _gravar_tabela(conexao, tabela, gravados, removidos):
+    """Upsert dos registros gravados e remoção dos ids removidos, dentro da transação aberta"""
+    colunas, _, _ = TABELAS[tabela]
+    atualizacao = ", ".join(f"{coluna} = excluded.{coluna}" for coluna in colunas)
+    conexao.executemany(
+        f"INSERT INTO {tabela} (id, {', '.join(colunas)}) "
+        f"VALUES ({', '.join('?' * (len(colunas) + 1))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {atualizacao}",
+        [_linha(tabela, registro) for registro in gravados]
+    )
+    conexao.executemany(
+        f"DELETE FROM {tabela} WHERE id = ?", [(id_,) for id_ in removidos]
+    )
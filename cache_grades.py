@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, fields, is_dataclass
+from database import gravar_json_atomico
+from models import Aula
+
+# Arquivo do cache de grades geradas e número máximo de grades guardadas
+CACHE_FILE = "cache_grades.json"
+LIMITE_CACHE = 20
+
+def _canonico(valor):
+    """Forma canônica para o hash: sem ids, conjuntos ordenados"""
+    if is_dataclass(valor):
+        return {
+            campo.name: _canonico(getattr(valor, campo.name))
+            for campo in fields(valor) if campo.name != "id"
+        }
+    if isinstance(valor, dict):
+        return {str(chave): _canonico(item) for chave, item in valor.items()}
+    if isinstance(valor, (set, frozenset)):
+        return sorted(_canonico(item) for item in valor)
+    if isinstance(valor, (list, tuple)):
+        return [_canonico(item) for item in valor]
+    return valor
+
+def chave_instancia(turmas, professores, disciplinas, salas, parametros):
+    """Hash SHA-256 dos dados da escola e dos parâmetros da geração
+
+    A ordem de cadastro das entidades não altera a chave; os parâmetros
+    devem incluir algoritmo, opções do solver, semente e dias estendidos.
+    """
+    def ordenar(entidades):
+        return sorted(
+            (_canonico(entidade) for entidade in entidades),
+            key=lambda item: json.dumps(item, sort_keys=True, ensure_ascii=False)
+        )
+
+    instancia = {
+        "turmas": ordenar(turmas),
+        "professores": ordenar(professores),
+        "disciplinas": ordenar(disciplinas),
+        "salas": ordenar(salas),
+        "parametros": _canonico(parametros)
+    }
+    texto = json.dumps(instancia, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def _carregar_cache():
+    """Carrega o cache do disco (chave -> lista de aulas), do mais antigo ao mais recente"""
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Erro ao carregar cache de grades: {e}")
+        return {}
+
+def _salvar_cache(cache):
+    """Salva o cache no disco (troca atômica: sessões simultâneas não corrompem o arquivo)"""
+    try:
+        gravar_json_atomico(CACHE_FILE, cache)
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar cache de grades: {e}")
+        return False
+
+def buscar_grade(chave):
+    """Retorna a grade guardada para a chave (ou None) e a marca como usada"""
+    cache = _carregar_cache()
+    aulas_data = cache.pop(chave, None)
+    if aulas_data is None:
+        return None
+
+    # Reinserir no fim: a ordem do dicionário é a ordem de uso (LRU)
+    cache[chave] = aulas_data
+    _salvar_cache(cache)
+    return [Aula(**aula_data) for aula_data in aulas_data]
+
+def guardar_grade(chave, aulas):
+    """Guarda a grade no cache, descartando as menos usadas além do limite"""
+    cache = _carregar_cache()
+    cache.pop(chave, None)
+    cache[chave] = [asdict(aula) for aula in aulas]
+    while len(cache) > LIMITE_CACHE:
+        cache.pop(next(iter(cache)))
+    return _salvar_cache(cache)
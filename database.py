@@ -1,48 +1,254 @@
 import json
 import os
-from models import Disciplina, Professor, Turma, Sala
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+import banco_sqlite
+from models import AulaFixa, Disciplina, Professor, Turma, Sala
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # Nome do arquivo de banco de dados
 DB_FILE = "escola_db.json"
 
+# Backend de armazenamento: "json" (um arquivo) ou "sqlite" (uma tabela por entidade)
+BACKEND = os.environ.get("ESCOLA_DB_BACKEND", "json")
+
+# Cache do JSON lido, compartilhado por todas as sessões do processo:
+# (mtime, tamanho) do arquivo -> dados. Os dados do cache não devem ser alterados.
+_cache_dados = {"assinatura": None, "dados": None}
+_trava_cache = threading.Lock()
+
+def _assinatura_arquivo():
+    """(mtime em ns, tamanho) do arquivo JSON"""
+    info = os.stat(DB_FILE)
+    return (info.st_mtime_ns, info.st_size)
+
 def carregar_dados():
-    """Carrega todos os dados do arquivo JSON"""
+    """Carrega todos os dados do arquivo JSON
+    
+    O arquivo só é lido de novo quando muda de mtime ou tamanho; o
+    dicionário devolvido é compartilhado e deve ser tratado como somente leitura.
+    """
     if not os.path.exists(DB_FILE):
         return {
             "disciplinas": [],
             "professores": [], 
             "turmas": [],
-            "salas": []
+            "salas": [],
+            "aulas_fixas": [],
+            "versoes": {}
         }
     
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with _trava_cache:
+            assinatura = _assinatura_arquivo()
+            if _cache_dados["assinatura"] != assinatura:
+                with open(DB_FILE, 'r', encoding='utf-8') as f:
+                    _cache_dados["dados"] = json.load(f)
+                _cache_dados["assinatura"] = assinatura
+            return _cache_dados["dados"]
     except Exception as e:
         print(f"Erro ao carregar dados: {e}")
         return {
             "disciplinas": [],
             "professores": [],
             "turmas": [],
-            "salas": []
+            "salas": [],
+            "aulas_fixas": [],
+            "versoes": {}
         }
 
+def gravar_json_atomico(caminho, dados, **opcoes_json):
+    """Grava JSON num arquivo temporário da mesma pasta e o troca pelo destino
+    
+    Com os.replace, quem lê vê o arquivo antigo ou o novo, nunca um pela
+    metade. O temporário é criado com open() comum (respeita a umask) e,
+    se o destino já existe, recebe as permissões dele.
+    """
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, **opcoes_json)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(caminho):
+            shutil.copymode(caminho, temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
 def salvar_dados(dados):
-    """Salva todos os dados no arquivo JSON"""
+    """Salva todos os dados no arquivo JSON, de forma atômica"""
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(dados, f, ensure_ascii=False, indent=2)
+        with _trava_cache:
+            gravar_json_atomico(DB_FILE, dados, indent=2)
+            _cache_dados["assinatura"] = _assinatura_arquivo()
+            _cache_dados["dados"] = dados
         return True
     except Exception as e:
         print(f"Erro ao salvar dados: {e}")
         return False
 
-def carregar_disciplinas():
-    """Carrega disciplinas do banco de dados"""
+def _carregar_entidade(chave, dados=None):
+    """Registros (dicionários) de uma entidade no backend configurado
+    
+    `dados` é um retrato já lido do banco ({entidade: registros}), para
+    carregar várias entidades de uma só leitura.
+    """
+    if dados is not None:
+        return dados.get(chave, [])
+    if BACKEND == "sqlite":
+        _preparar_sqlite()
+        return banco_sqlite.carregar_registros(chave)
+    return carregar_dados().get(chave, [])
+
+@contextmanager
+def _trava_arquivo():
+    """Trava exclusiva do sistema operacional sobre o banco JSON
+    
+    Vale entre sessões, threads e processos: só quem tem a trava relê o
+    arquivo e grava por cima dele.
+    """
+    with open(f"{DB_FILE}.lock", "a+") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _id_registro(registro):
+    """Id do registro gravado (registros antigos podem ter só "_id")"""
+    return registro.get("id", str(registro.get("_id", "")))
+
+def _salvar_entidade(chave, registros):
+    """Grava a lista completa de uma entidade no backend configurado
+    
+    Compara com o que está no banco e grava só os registros que mudaram
+    e as remoções.
+    """
+    atuais = {_id_registro(registro): registro for registro in _carregar_entidade(chave)}
+    ids = {registro["id"] for registro in registros}
+    gravados = [registro for registro in registros if atuais.get(registro["id"]) != registro]
+    removidos = [id_ for id_ in atuais if id_ not in ids]
+    if not gravados and not removidos:
+        return True
+    return _salvar_alteracoes({chave: (gravados, removidos)}) is not None
+
+def _aplicar_alteracoes(registros, gravados, removidos):
+    """Nova lista de registros com os gravados substituídos ou acrescentados e os removidos fora"""
+    registros = list(registros)
+    posicoes = {_id_registro(registro): i for i, registro in enumerate(registros)}
+    for registro in gravados:
+        posicao = posicoes.get(registro["id"])
+        if posicao is None:
+            posicoes[registro["id"]] = len(registros)
+            registros.append(registro)
+        else:
+            registros[posicao] = registro
+    removidos = set(removidos)
+    return [registro for registro in registros if _id_registro(registro) not in removidos]
+
+def _versoes_json(dados, chave):
+    """Versões gravadas dos registros de uma entidade no JSON: {id: versão}"""
+    versoes = dados.get("versoes", {}).get(chave, {})
+    # Arquivos antigos guardavam um número por entidade: sem versões por registro
+    return versoes if isinstance(versoes, dict) else {}
+
+def _salvar_alteracoes(alteracoes, versoes_esperadas=None):
+    """Grava {entidade: (registros gravados, ids removidos)} de uma vez: uma escrita do JSON ou uma transação do SQLite
+    
+    Só os registros informados são gravados ou removidos, sem reler nem
+    comparar as tabelas inteiras, e cada registro gravado tem sua versão
+    incrementada. Com `versoes_esperadas` ({entidade: {id: versão}} que a
+    sessão carregou, 0 para registros novos), um registro que outra sessão
+    alterou ou excluiu nesse meio tempo não é gravado e volta em
+    "conflitos" com o conteúdo atual do banco; os demais são gravados.
+    Retorna {"versoes": {entidade: {id: nova versão}}, "conflitos":
+    {entidade: {id: (versão, registro ou None)}}}, ou None em caso de erro.
+    """
+    if BACKEND == "sqlite":
+        _preparar_sqlite()
+        return banco_sqlite.salvar_lote(alteracoes, versoes_esperadas)
+    
+    with _trava_arquivo():
+        dados = carregar_dados()
+        resultado = {"versoes": {}, "conflitos": {}}
+        todas_versoes = {}
+        
+        # Novo dicionário: o lido pode estar no cache compartilhado
+        dados = dict(dados)
+        for chave, (gravados, removidos) in alteracoes.items():
+            registros = {_id_registro(registro): registro for registro in dados.get(chave, [])}
+            versoes = dict(_versoes_json(dados, chave))
+            
+            def atual(id_):
+                if id_ not in registros:
+                    return 0, None
+                return versoes.get(id_, 1), registros[id_]
+            
+            if versoes_esperadas is not None:
+                esperadas = versoes_esperadas.get(chave, {})
+                ids = [registro["id"] for registro in gravados] + list(removidos)
+                conflitos = {
+                    id_: atual(id_) for id_ in ids if atual(id_)[0] != esperadas.get(id_, 0)
+                }
+                if conflitos:
+                    resultado["conflitos"][chave] = conflitos
+                    gravados = [registro for registro in gravados if registro["id"] not in conflitos]
+                    removidos = [id_ for id_ in removidos if id_ not in conflitos]
+            
+            novas = {registro["id"]: atual(registro["id"])[0] + 1 for registro in gravados}
+            dados[chave] = _aplicar_alteracoes(dados.get(chave, []), gravados, removidos)
+            versoes.update(novas)
+            for id_ in removidos:
+                versoes.pop(id_, None)
+            todas_versoes[chave] = versoes
+            resultado["versoes"][chave] = novas
+        
+        dados["versoes"] = {
+            chave: todas_versoes.get(chave, _versoes_json(dados, chave)) for chave in _REGISTROS
+        }
+        return resultado if salvar_dados(dados) else None
+
+def _preparar_sqlite():
+    """Na primeira vez que o SQLite é usado, migra os dados do arquivo JSON"""
+    if not os.path.exists(banco_sqlite.SQLITE_FILE) and os.path.exists(DB_FILE):
+        migrar_json_para_sqlite()
+
+def migrar_json_para_sqlite():
+    """Copia todas as entidades do escola_db.json para o banco SQLite"""
     dados = carregar_dados()
+    registros_por_tabela = {}
+    for tabela in banco_sqlite.TABELAS:
+        registros = []
+        for registro in dados.get(tabela, []):
+            # Registros antigos podem ter só "_id" ou id vazio
+            registro = dict(registro)
+            registro["id"] = registro.get("id") or str(registro.get("_id") or uuid.uuid4())
+            registros.append(registro)
+        registros_por_tabela[tabela] = (registros, [])
+    return banco_sqlite.salvar_lote(registros_por_tabela) is not None
+
+def carregar_disciplinas(dados=None):
+    """Carrega disciplinas do banco de dados"""
     disciplinas = []
     
-    for disc_data in dados.get("disciplinas", []):
+    for disc_data in _carregar_entidade("disciplinas", dados):
         try:
             # ✅ CORREÇÃO: Garantir compatibilidade com turmas como lista
             turmas = disc_data.get("turmas", [])
@@ -54,10 +260,12 @@ def carregar_disciplinas():
                 nome=disc_data["nome"],
                 carga_semanal=disc_data["carga_semanal"],
                 tipo=disc_data["tipo"],
-                turmas=turmas,  # ✅ AGORA sempre lista
+                turmas=list(turmas),  # ✅ AGORA sempre lista (cópia: o registro pode estar em cache)
                 grupo=disc_data.get("grupo", "A"),
                 cor_fundo=disc_data.get("cor_fundo", "#4A90E2"),
                 cor_fonte=disc_data.get("cor_fonte", "#FFFFFF"),
+                tipo_sala=disc_data.get("tipo_sala", ""),
+                tamanho_bloco=disc_data.get("tamanho_bloco", 1),
                 id=disc_data.get("id", str(disc_data.get("_id", "")))
             )
             disciplinas.append(disciplina)
@@ -66,36 +274,34 @@ def carregar_disciplinas():
     
     return disciplinas
 
+def _registro_disciplina(disc):
+    """Dicionário gravado no banco para a disciplina"""
+    return {
+        "id": disc.id,
+        "nome": disc.nome,
+        "carga_semanal": disc.carga_semanal,
+        "tipo": disc.tipo,
+        "turmas": list(disc.turmas),  # ✅ AGORA salva como lista
+        "grupo": disc.grupo,
+        "cor_fundo": disc.cor_fundo,
+        "cor_fonte": disc.cor_fonte,
+        "tipo_sala": disc.tipo_sala,
+        "tamanho_bloco": disc.tamanho_bloco
+    }
+
 def salvar_disciplinas(disciplinas):
     """Salva disciplinas no banco de dados"""
-    dados = carregar_dados()
-    
-    dados["disciplinas"] = []
-    for disc in disciplinas:
-        disc_data = {
-            "id": disc.id,
-            "nome": disc.nome,
-            "carga_semanal": disc.carga_semanal,
-            "tipo": disc.tipo,
-            "turmas": disc.turmas,  # ✅ AGORA salva como lista
-            "grupo": disc.grupo,
-            "cor_fundo": disc.cor_fundo,
-            "cor_fonte": disc.cor_fonte
-        }
-        dados["disciplinas"].append(disc_data)
-    
-    return salvar_dados(dados)
+    return _salvar_entidade("disciplinas", [_registro_disciplina(disc) for disc in disciplinas])
 
-def carregar_professores():
+def carregar_professores(dados=None):
     """Carrega professores do banco de dados"""
-    dados = carregar_dados()
     professores = []
     
-    for prof_data in dados.get("professores", []):
+    for prof_data in _carregar_entidade("professores", dados):
         try:
             professor = Professor(
                 nome=prof_data["nome"],
-                disciplinas=prof_data["disciplinas"],
+                disciplinas=list(prof_data["disciplinas"]),
                 disponibilidade=set(prof_data.get("disponibilidade", [])),
                 grupo=prof_data.get("grupo", "A"),
                 horarios_indisponiveis=set(prof_data.get("horarios_indisponiveis", [])),
@@ -107,30 +313,26 @@ def carregar_professores():
     
     return professores
 
+def _registro_professor(prof):
+    """Dicionário gravado no banco para o professor"""
+    return {
+        "id": prof.id,
+        "nome": prof.nome,
+        "disciplinas": list(prof.disciplinas),
+        "disponibilidade": sorted(prof.disponibilidade),
+        "grupo": prof.grupo,
+        "horarios_indisponiveis": sorted(prof.horarios_indisponiveis)
+    }
+
 def salvar_professores(professores):
     """Salva professores no banco de dados"""
-    dados = carregar_dados()
-    
-    dados["professores"] = []
-    for prof in professores:
-        prof_data = {
-            "id": prof.id,
-            "nome": prof.nome,
-            "disciplinas": prof.disciplinas,
-            "disponibilidade": list(prof.disponibilidade),
-            "grupo": prof.grupo,
-            "horarios_indisponiveis": list(prof.horarios_indisponiveis)
-        }
-        dados["professores"].append(prof_data)
-    
-    return salvar_dados(dados)
+    return _salvar_entidade("professores", [_registro_professor(prof) for prof in professores])
 
-def carregar_turmas():
+def carregar_turmas(dados=None):
     """Carrega turmas do banco de dados"""
-    dados = carregar_dados()
     turmas = []
     
-    for turma_data in dados.get("turmas", []):
+    for turma_data in _carregar_entidade("turmas", dados):
         try:
             turma = Turma(
                 nome=turma_data["nome"],
@@ -138,6 +340,7 @@ def carregar_turmas():
                 turno=turma_data["turno"],
                 grupo=turma_data.get("grupo", "A"),
                 segmento=turma_data.get("segmento", "EF_II"),
+                alunos=turma_data.get("alunos", 0),
                 id=turma_data.get("id", str(turma_data.get("_id", "")))
             )
             turmas.append(turma)
@@ -146,30 +349,27 @@ def carregar_turmas():
     
     return turmas
 
+def _registro_turma(turma):
+    """Dicionário gravado no banco para a turma"""
+    return {
+        "id": turma.id,
+        "nome": turma.nome,
+        "serie": turma.serie,
+        "turno": turma.turno,
+        "grupo": turma.grupo,
+        "segmento": turma.segmento,
+        "alunos": turma.alunos
+    }
+
 def salvar_turmas(turmas):
     """Salva turmas no banco de dados"""
-    dados = carregar_dados()
-    
-    dados["turmas"] = []
-    for turma in turmas:
-        turma_data = {
-            "id": turma.id,
-            "nome": turma.nome,
-            "serie": turma.serie,
-            "turno": turma.turno,
-            "grupo": turma.grupo,
-            "segmento": turma.segmento
-        }
-        dados["turmas"].append(turma_data)
-    
-    return salvar_dados(dados)
+    return _salvar_entidade("turmas", [_registro_turma(turma) for turma in turmas])
 
-def carregar_salas():
+def carregar_salas(dados=None):
     """Carrega salas do banco de dados"""
-    dados = carregar_dados()
     salas = []
     
-    for sala_data in dados.get("salas", []):
+    for sala_data in _carregar_entidade("salas", dados):
         try:
             sala = Sala(
                 nome=sala_data["nome"],
@@ -183,27 +383,128 @@ def carregar_salas():
     
     return salas
 
+def _registro_sala(sala):
+    """Dicionário gravado no banco para a sala"""
+    return {
+        "id": sala.id,
+        "nome": sala.nome,
+        "capacidade": sala.capacidade,
+        "tipo": sala.tipo
+    }
+
 def salvar_salas(salas):
     """Salva salas no banco de dados"""
-    dados = carregar_dados()
+    return _salvar_entidade("salas", [_registro_sala(sala) for sala in salas])
+
+def carregar_aulas_fixas(dados=None):
+    """Carrega aulas fixas do banco de dados"""
+    aulas_fixas = []
     
-    dados["salas"] = []
-    for sala in salas:
-        sala_data = {
-            "id": sala.id,
-            "nome": sala.nome,
-            "capacidade": sala.capacidade,
-            "tipo": sala.tipo
-        }
-        dados["salas"].append(sala_data)
+    for aula_data in _carregar_entidade("aulas_fixas", dados):
+        try:
+            aula_fixa = AulaFixa(
+                turma=aula_data["turma"],
+                disciplina=aula_data["disciplina"],
+                professor=aula_data["professor"],
+                dia=aula_data["dia"],
+                horario=aula_data["horario"],
+                sala=aula_data.get("sala", ""),
+                id=aula_data.get("id", str(aula_data.get("_id", "")))
+            )
+            aulas_fixas.append(aula_fixa)
+        except Exception as e:
+            print(f"Erro ao carregar aula fixa {aula_data}: {e}")
+    
+    return aulas_fixas
+
+def _registro_aula_fixa(aula):
+    """Dicionário gravado no banco para a aula fixa"""
+    return {
+        "id": aula.id,
+        "turma": aula.turma,
+        "disciplina": aula.disciplina,
+        "professor": aula.professor,
+        "dia": aula.dia,
+        "horario": aula.horario,
+        "sala": aula.sala
+    }
+
+def salvar_aulas_fixas(aulas_fixas):
+    """Salva aulas fixas no banco de dados"""
+    return _salvar_entidade("aulas_fixas", [_registro_aula_fixa(aula) for aula in aulas_fixas])
+
+def salvar_alteracoes(alteracoes, versoes_esperadas=None):
+    """Salva de uma só vez {entidade: (objetos alterados, ids removidos)}
+    
+    Retorna {"versoes", "conflitos"} como _salvar_alteracoes, com os
+    registros em conflito já convertidos em objetos (None se excluídos),
+    ou None em caso de erro.
+    """
+    resultado = _salvar_alteracoes({
+        chave: ([_REGISTROS[chave](item) for item in alterados], list(removidos))
+        for chave, (alterados, removidos) in alteracoes.items()
+    }, versoes_esperadas)
+    if resultado is not None:
+        for chave, conflitos in resultado["conflitos"].items():
+            for id_, (versao, registro) in conflitos.items():
+                objetos = _CARREGADORES[chave]({chave: [registro]}) if registro else []
+                conflitos[id_] = (versao, objetos[0] if objetos else None)
+    return resultado
+
+# Entidade -> função que monta o dicionário gravado de cada objeto
+_REGISTROS = {
+    "disciplinas": _registro_disciplina,
+    "professores": _registro_professor,
+    "turmas": _registro_turma,
+    "salas": _registro_sala,
+    "aulas_fixas": _registro_aula_fixa
+}
+
+# Entidade -> função que converte registros ({entidade: registros}) em objetos
+_CARREGADORES = {
+    "disciplinas": carregar_disciplinas,
+    "professores": carregar_professores,
+    "turmas": carregar_turmas,
+    "salas": carregar_salas,
+    "aulas_fixas": carregar_aulas_fixas
+}
+
+def carregar_tudo():
+    """Carrega todas as entidades de uma só leitura do banco
     
-    return salvar_dados(dados)
+    Retorna {"disciplinas", "professores", "turmas", "salas", "aulas_fixas"}
+    com as listas de objetos e "versoes" com a versão de cada registro
+    nesse retrato, {entidade: {id: versão}}, a ser passada em salvar_alteracoes.
+    """
+    if BACKEND == "sqlite":
+        _preparar_sqlite()
+        dados, versoes = banco_sqlite.carregar_lote()
+    else:
+        dados = carregar_dados()
+        versoes = {}
+        for chave in _REGISTROS:
+            gravadas = _versoes_json(dados, chave)
+            versoes[chave] = {
+                _id_registro(registro): gravadas.get(_id_registro(registro), 1)
+                for registro in dados.get(chave, [])
+            }
+    return {
+        "disciplinas": carregar_disciplinas(dados),
+        "professores": carregar_professores(dados),
+        "turmas": carregar_turmas(dados),
+        "salas": carregar_salas(dados),
+        "aulas_fixas": carregar_aulas_fixas(dados),
+        "versoes": versoes
+    }
 
 def resetar_banco():
     """Reseta o banco de dados (para desenvolvimento)"""
     try:
-        if os.path.exists(DB_FILE):
-            os.remove(DB_FILE)
+        for arquivo in (DB_FILE, banco_sqlite.SQLITE_FILE):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+        with _trava_cache:
+            _cache_dados["assinatura"] = _cache_dados["dados"] = None
         return True
     except Exception as e:
         print(f"Erro ao resetar banco: {e}")
@@ -0,0 +1,186 @@
+import json
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from models import Aula
+
+# Arquivo com as versões das grades geradas
+HISTORICO_FILE = "historico_grades.sqlite"
+
+# Colunas de texto da Aula guardadas como códigos inteiros (posição no dicionário da versão)
+COLUNAS_CODIFICADAS = ("turma", "dia", "horario_real", "disciplina", "professor", "sala", "grupo")
+
+def _conectar():
+    """Abre o histórico e cria as tabelas que faltarem
+
+    `versoes` guarda só os metadados, para listar sem ler as grades;
+    `conteudos` guarda os dicionários e as colunas compactadas de cada versão.
+    """
+    conexao = sqlite3.connect(HISTORICO_FILE)
+    with conexao:
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS versoes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, criada_em REAL, chave_instancia TEXT, "
+            "algoritmo TEXT, total_aulas INTEGER, turmas TEXT, estatisticas TEXT)"
+        )
+        conexao.execute(
+            "CREATE INDEX IF NOT EXISTS idx_versoes_chave ON versoes (chave_instancia)"
+        )
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS conteudos ("
+            "versao INTEGER PRIMARY KEY, dicionarios TEXT, colunas BLOB)"
+        )
+    return conexao
+
+def _para_bytes(valores):
+    """Bytes little-endian de um array, independente da máquina"""
+    if sys.byteorder == "big":
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+def _de_bytes(tipo, dados):
+    """Array lido de bytes little-endian"""
+    valores = array(tipo)
+    valores.frombytes(dados)
+    if sys.byteorder == "big":
+        valores.byteswap()
+    return valores
+
+def _codificar(aulas):
+    """Dicionários {coluna: [valores]} e bytes compactados das colunas da grade"""
+    dicionarios = {coluna: [] for coluna in COLUNAS_CODIFICADAS}
+    posicoes = {coluna: {} for coluna in COLUNAS_CODIFICADAS}
+    colunas = {coluna: array('H') for coluna in COLUNAS_CODIFICADAS}
+    horarios = array('B')
+    for aula in aulas:
+        for coluna in COLUNAS_CODIFICADAS:
+            valor = getattr(aula, coluna)
+            codigo = posicoes[coluna].get(valor)
+            if codigo is None:
+                codigo = posicoes[coluna][valor] = len(dicionarios[coluna])
+                dicionarios[coluna].append(valor)
+            colunas[coluna].append(codigo)
+        horarios.append(aula.horario)
+
+    dados = b"".join(_para_bytes(colunas[coluna]) for coluna in COLUNAS_CODIFICADAS)
+    return dicionarios, zlib.compress(dados + horarios.tobytes())
+
+def _decodificar(dicionarios, dados, total_aulas):
+    """Lista de Aula a partir dos dicionários e das colunas compactadas"""
+    dados = zlib.decompress(dados)
+    tamanho = total_aulas * array('H').itemsize
+    valores = {}
+    for indice, coluna in enumerate(COLUNAS_CODIFICADAS):
+        codigos = _de_bytes('H', dados[indice * tamanho:(indice + 1) * tamanho])
+        valores[coluna] = [dicionarios[coluna][codigo] for codigo in codigos]
+    horarios = array('B', dados[len(COLUNAS_CODIFICADAS) * tamanho:])
+
+    return [
+        Aula(horario=horarios[i], **{coluna: valores[coluna][i] for coluna in COLUNAS_CODIFICADAS})
+        for i in range(total_aulas)
+    ]
+
+def salvar_versao(aulas, turmas, chave_instancia, algoritmo, estatisticas=None):
+    """Guarda a grade como nova versão e retorna o número da versão
+
+    `turmas` são os nomes das turmas da grade (inclusive as que ficaram
+    sem aula); `chave_instancia` é o hash dos dados e parâmetros usados.
+    """
+    dicionarios, colunas = _codificar(aulas)
+    conexao = _conectar()
+    try:
+        with conexao:
+            cursor = conexao.execute(
+                "INSERT INTO versoes (criada_em, chave_instancia, algoritmo, total_aulas, turmas, estatisticas) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), chave_instancia, algoritmo, len(aulas),
+                 json.dumps(list(turmas), ensure_ascii=False),
+                 json.dumps(estatisticas or {}, ensure_ascii=False, default=str))
+            )
+            versao = cursor.lastrowid
+            conexao.execute(
+                "INSERT INTO conteudos (versao, dicionarios, colunas) VALUES (?, ?, ?)",
+                (versao, json.dumps(dicionarios, ensure_ascii=False), colunas)
+            )
+        return versao
+    finally:
+        conexao.close()
+
+def listar_versoes(limite=None):
+    """Metadados das versões, da mais recente para a mais antiga"""
+    conexao = _conectar()
+    try:
+        consulta = (
+            "SELECT id, criada_em, chave_instancia, algoritmo, total_aulas, turmas, estatisticas "
+            "FROM versoes ORDER BY id DESC"
+        )
+        if limite is not None:
+            consulta += f" LIMIT {int(limite)}"
+        return [
+            {
+                "versao": versao,
+                "criada_em": criada_em,
+                "chave_instancia": chave,
+                "algoritmo": algoritmo,
+                "total_aulas": total_aulas,
+                "turmas": json.loads(turmas),
+                "estatisticas": json.loads(estatisticas)
+            }
+            for versao, criada_em, chave, algoritmo, total_aulas, turmas, estatisticas
+            in conexao.execute(consulta)
+        ]
+    finally:
+        conexao.close()
+
+def carregar_versao(versao):
+    """Retorna (aulas, nomes das turmas) da versão, ou None se ela não existir"""
+    conexao = _conectar()
+    try:
+        linha = conexao.execute(
+            "SELECT v.total_aulas, v.turmas, c.dicionarios, c.colunas "
+            "FROM versoes v JOIN conteudos c ON c.versao = v.id WHERE v.id = ?",
+            (versao,)
+        ).fetchone()
+    finally:
+        conexao.close()
+    if linha is None:
+        return None
+    total_aulas, turmas, dicionarios, colunas = linha
+    return _decodificar(json.loads(dicionarios), colunas, total_aulas), json.loads(turmas)
+
+def excluir_versao(versao):
+    """Apaga a versão e sua grade"""
+    conexao = _conectar()
+    try:
+        with conexao:
+            conexao.execute("DELETE FROM conteudos WHERE versao = ?", (versao,))
+            conexao.execute("DELETE FROM versoes WHERE id = ?", (versao,))
+        return True
+    finally:
+        conexao.close()
+
+def comparar_versoes(versao_antiga, versao_nova):
+    """Diferenças entre duas versões, por (turma, dia, horário)
+
+    Retorna {"adicionadas": [Aula], "removidas": [Aula], "alteradas": [(Aula antiga, Aula nova)]}.
+    """
+    antigas = {
+        (aula.turma, aula.dia, aula.horario): aula for aula in carregar_versao(versao_antiga)[0]
+    }
+    novas = {
+        (aula.turma, aula.dia, aula.horario): aula for aula in carregar_versao(versao_nova)[0]
+    }
+    campos = ("disciplina", "professor", "sala")
+    return {
+        "adicionadas": [aula for chave, aula in novas.items() if chave not in antigas],
+        "removidas": [aula for chave, aula in antigas.items() if chave not in novas],
+        "alteradas": [
+            (antigas[chave], aula) for chave, aula in novas.items()
+            if chave in antigas and any(
+                getattr(antigas[chave], campo) != getattr(aula, campo) for campo in campos
+            )
+        ]
+    }
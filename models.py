@@ -37,6 +37,8 @@ class Disciplina:
     grupo: str = "A"  # "A" ou "B"
     cor_fundo: str = "#4A90E2"
     cor_fonte: str = "#FFFFFF"
+    tipo_sala: str = ""  # Tipo de sala exigido ("" = qualquer sala)
+    tamanho_bloco: int = 1  # Aulas seguidas por bloco (2 = aula geminada)
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 @dataclass
@@ -55,6 +57,7 @@ class Turma:
     turno: str
     grupo: str = "A"  # "A" ou "B"
     segmento: str = "EF_II"  # "EF_II" ou "EM"
+    alunos: int = 0  # Número de alunos (0 = não informado)
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 @dataclass
@@ -74,4 +77,30 @@ class Aula:
     professor: str
     sala: str
     grupo: str = "A"  # "A" ou "B"
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
\ No newline at end of file
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+@dataclass
+class AulaFixa:
+    turma: str
+    disciplina: str
+    professor: str
+    dia: str  # "seg", "ter", etc.
+    horario: int  # 1-7
+    sala: str = ""  # "" = qualquer sala compatível
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+@dataclass
+class AulaNaoAlocada:
+    turma: str
+    disciplina: str
+    motivo: str
+
+@dataclass
+class ResultadoGrade:
+    aulas: List[Aula]  # Aulas alocadas (grade parcial se faltar alguma)
+    nao_alocadas: List[AulaNaoAlocada] = field(default_factory=list)  # Uma entrada por aula faltante
+    estatisticas: dict = field(default_factory=dict)  # Tempo, status e dados do algoritmo
+
+    @property
+    def completa(self):
+        return not self.nao_alocadas
@@ -0,0 +1,184 @@
+import multiprocessing
+import queue
+import time
+from collections import Counter
+from scheduler_ortools import GradeHorariaORTools
+from simple_scheduler import SimpleGradeHoraria, contar_janelas_professores
+from viabilidade import montar_resultado
+import streamlit as st
+
+# Motores disputados pelo portfolio
+MOTORES = {
+    "simples": "Algoritmo simples",
+    "ortools": "OR-Tools",
+    "lns": "Simples + LNS"
+}
+
+class PortfolioGrade:
+    """Roda os algoritmos em processos paralelos e fica com a melhor grade
+
+    Sem `aguardar_prazo`, devolve a primeira grade completa e encerra os
+    outros processos; com ele, espera até o prazo (ou todos terminarem) e
+    escolhe a grade com menos aulas faltando e menos janelas de professores.
+    """
+
+    def __init__(self, turmas, professores, disciplinas, salas, dias_em_estendido=None,
+                 prazo=60.0, aguardar_prazo=False, semente=0, num_search_workers=8,
+                 motores=None, aulas_fixas=None, exibir_avisos=True):
+        self.turmas = turmas
+        self.professores = professores
+        self.disciplinas = disciplinas
+        self.salas = salas
+        self.dias_em_estendido = dias_em_estendido or []
+        self.prazo = prazo
+        self.aguardar_prazo = aguardar_prazo
+        self.semente = semente
+        self.num_search_workers = num_search_workers
+        self.aulas_fixas = aulas_fixas or []
+        self.exibir_avisos = exibir_avisos
+        # A LNS só compensa quando se espera até o prazo
+        self.motores = list(motores or (MOTORES if aguardar_prazo else ["simples", "ortools"]))
+
+        # Motor vencedor, tempo e resultados da última execução
+        self.estatisticas = {}
+
+        # Aulas que ficaram sem horário na grade escolhida: [(turma, disciplina)]
+        self.aulas_nao_alocadas = []
+
+    def gerar_grade(self):
+        """Dispara os motores e devolve a grade escolhida dentro do prazo"""
+        inicio = time.time()
+        fila = multiprocessing.Queue()
+        processos = []
+        try:
+            for motor in self.motores:
+                argumentos = (
+                    self.turmas, self.professores, self.disciplinas, self.salas,
+                    self.dias_em_estendido, self.prazo, self.semente, self.num_search_workers,
+                    self.aulas_fixas
+                )
+                processo = multiprocessing.Process(
+                    target=_executar_motor, args=(motor, argumentos, fila), daemon=True
+                )
+                processo.start()
+                processos.append(processo)
+
+            melhor = None  # (chave de comparação, motor, aulas, faltantes, tempo)
+            resultados = {}
+            while len(resultados) < len(processos):
+                restante = self.prazo - (time.time() - inicio)
+                if restante <= 0:
+                    break
+                try:
+                    motor, aulas = fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+
+                tempo = time.time() - inicio
+                if aulas is None:
+                    resultados[motor] = {"tempo": tempo, "faltantes": None}
+                    continue
+                faltantes = self._aulas_faltantes(aulas)
+                resultados[motor] = {"tempo": tempo, "faltantes": len(faltantes)}
+                chave = (len(faltantes), contar_janelas_professores(aulas))
+                if melhor is None or chave < melhor[0]:
+                    melhor = (chave, motor, aulas, faltantes, tempo)
+                if not faltantes and not self.aguardar_prazo:
+                    break
+
+            self.estatisticas = {
+                "status": "SEM_SOLUCAO" if melhor is None else "CONCLUIDO",
+                "tempo": time.time() - inicio,
+                "resultados": resultados
+            }
+            if melhor is None:
+                st.error("❌ Nenhum algoritmo do portfolio encontrou grade dentro do prazo.")
+                return None
+
+            _, motor, aulas, faltantes, tempo = melhor
+            self.estatisticas["vencedor"] = motor
+            self.estatisticas["tempo_vencedor"] = tempo
+            self.aulas_nao_alocadas = faltantes
+            if self.exibir_avisos:
+                for turma, disc in faltantes:
+                    st.warning(f"⚠️ Não foi possível alocar {disc.nome} para {turma.nome}")
+            return aulas
+
+        except Exception as e:
+            st.error(f"❌ Erro no portfolio: {str(e)}")
+            return None
+        finally:
+            # Os motores que ainda estão rodando são cancelados
+            for processo in processos:
+                if processo.is_alive():
+                    processo.terminate()
+            for processo in processos:
+                processo.join(timeout=1)
+
+    def gerar_resultado(self):
+        """Roda a disputa e devolve um ResultadoGrade com a grade escolhida
+
+        As aulas faltantes vão para o relatório, sem um aviso para cada uma.
+        """
+        exibir_avisos = self.exibir_avisos
+        self.exibir_avisos = False
+        try:
+            aulas = self.gerar_grade()
+        finally:
+            self.exibir_avisos = exibir_avisos
+        return montar_resultado(
+            aulas, self.turmas, self.professores, self.disciplinas, self.salas,
+            {"algoritmo": "portfolio", **self.estatisticas},
+            "Nenhum algoritmo encaixou a aula dentro do prazo"
+        )
+
+    def _aulas_faltantes(self, aulas):
+        """Aulas da carga semanal que não aparecem na grade: [(turma, disciplina)]"""
+        alocadas = Counter((aula.turma, aula.disciplina) for aula in aulas)
+        faltantes = []
+        for turma in self.turmas:
+            for disc in self.disciplinas:
+                if turma.nome in disc.turmas and disc.grupo == turma.grupo:
+                    falta = disc.carga_semanal - alocadas[(turma.nome, disc.nome)]
+                    faltantes.extend([(turma, disc)] * max(falta, 0))
+        return faltantes
+
+
+def _executar_motor(motor, argumentos, fila):
+    """Executa um motor do portfolio em outro processo e envia a grade pela fila"""
+    (turmas, professores, disciplinas, salas,
+     dias_em_estendido, prazo, semente, num_search_workers, aulas_fixas) = argumentos
+    inicio = time.time()
+    try:
+        if motor == "ortools":
+            aulas = GradeHorariaORTools(
+                turmas, professores, disciplinas, salas,
+                dias_em_estendido=dias_em_estendido,
+                num_search_workers=num_search_workers,
+                max_time_in_seconds=prazo,
+                aulas_fixas=aulas_fixas
+            ).gerar_grade()
+        else:
+            aulas = SimpleGradeHoraria(
+                turmas, professores, disciplinas, salas,
+                dias_em_estendido=dias_em_estendido,
+                estrategia="mais_restrita",
+                tempo_reparo=prazo / 2,
+                semente=semente,
+                exibir_avisos=False,
+                aulas_fixas=aulas_fixas
+            ).gerar_grade()
+            if motor == "lns" and aulas is not None:
+                # Reserva uma folga para devolver a grade antes do prazo
+                tempo_restante = prazo * 0.9 - (time.time() - inicio)
+                if tempo_restante > 1:
+                    aulas = GradeHorariaORTools(
+                        turmas, professores, disciplinas, salas,
+                        dias_em_estendido=dias_em_estendido,
+                        num_search_workers=max(1, num_search_workers // 2),
+                        aulas_fixas=aulas_fixas
+                    ).melhorar_grade(aulas, tempo_total=tempo_restante, semente=semente) or aulas
+    except Exception as e:
+        print(f"Erro no motor {motor} do portfolio: {e}")
+        aulas = None
+    fila.put((motor, aulas))
@@ -1,9 +1,45 @@
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from ortools.sat.python import cp_model
+from alocacao_salas import atribuir_salas, sala_compativel
 from models import Aula, DIAS_SEMANA, HORARIOS_EFII, HORARIOS_EM, HORARIOS_REAIS
+from neuro_rules import eh_horario_ideal
+from viabilidade import montar_resultado
 import streamlit as st
 
+# Pesos padrão do objetivo pedagógico
+PESOS_PADRAO = {
+    "horario_nao_ideal": 1,  # aula fora do horário ideal do tipo da disciplina
+    "janela_professor": 3,  # horário vago entre duas aulas do professor no dia
+    "repeticao_dia": 2  # aula extra da mesma disciplina no mesmo dia
+}
+
+class ProgressoSolucao(cp_model.CpSolverSolutionCallback):
+    """Repassa objetivo e limite de cada solução encontrada para uma função"""
+    
+    def __init__(self, callback_progresso):
+        super().__init__()
+        self.callback_progresso = callback_progresso
+        self.solucoes = 0
+    
+    def on_solution_callback(self):
+        self.solucoes += 1
+        self.callback_progresso({
+            "solucoes": self.solucoes,
+            "objetivo": self.ObjectiveValue(),
+            "limite": self.BestObjectiveBound(),
+            "tempo": self.WallTime()
+        })
+
 class GradeHorariaORTools:
-    def __init__(self, turmas, professores, disciplinas, salas, dias_em_estendido=None):
+    def __init__(self, turmas, professores, disciplinas, salas, dias_em_estendido=None,
+                 num_search_workers=8, max_time_in_seconds=60.0, relative_gap=0.0,
+                 log_search_progress=False, callback_progresso=None,
+                 grade_inicial=None, alteradas=None, modo_salas="integrado",
+                 otimizar=False, pesos=None, quebrar_simetrias=True, parcial=False,
+                 aulas_fixas=None):
         self.turmas = turmas
         self.professores = professores
         self.disciplinas = disciplinas
@@ -13,8 +49,65 @@ class GradeHorariaORTools:
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         
+        # Parâmetros do solver
+        self.num_search_workers = num_search_workers
+        self.max_time_in_seconds = max_time_in_seconds
+        self.relative_gap = relative_gap
+        self.solver.parameters.num_search_workers = num_search_workers
+        if max_time_in_seconds:
+            self.solver.parameters.max_time_in_seconds = max_time_in_seconds
+        self.solver.parameters.relative_gap_limit = relative_gap
+        self.solver.parameters.log_search_progress = log_search_progress
+        self.callback_progresso = callback_progresso
+        
+        # Grade usada como dica (AddHint) e nomes de turmas/professores/disciplinas
+        # (ou dias) alterados; com `alteradas`, as aulas que não envolvem esses
+        # nomes ficam fixas
+        self.grade_inicial = grade_inicial or []
+        self.alteradas = set(alteradas) if alteradas is not None else None
+        
+        # "integrado": salas escolhidas pelo CP-SAT; "emparelhamento": o CP-SAT
+        # escolhe só os horários e as salas vêm de um emparelhamento bipartido
+        self.modo_salas = modo_salas
+        
+        # Objetivo ponderado com as preferências de neuro_rules, janelas e repetições
+        self.otimizar = otimizar
+        self.pesos = {**PESOS_PADRAO, **(pesos or {})}
+        
+        # Carga semanal como limite superior, maximizando as aulas alocadas:
+        # no tempo limite sobra uma grade parcial em vez de nenhuma
+        self.parcial = parcial
+        self.aulas_faltantes = []  # Expressões (carga - aulas alocadas) do modo parcial
+        
+        # Salas iguais (tipo e capacidade) viram uma só classe com contagem e
+        # professores equivalentes recebem ordem de carga, evitando permutações
+        self.quebrar_simetrias = quebrar_simetrias
+        # sala -> primeira sala da sua classe; classe -> salas da classe
+        self.classe_da_sala = {}
+        self.salas_da_classe = {}
+        
+        # Aulas fixadas de antemão (AulaFixa): presença, professor e sala fixos
+        self.aulas_fixas = aulas_fixas or []
+        self.salas_fixas = {}  # (turma, disciplina, dia, horario) -> sala exigida
+        
+        # Status, tempo e objetivo da última execução
+        self.estatisticas = {}
+        
+        # Suposições do modo diagnóstico: chave -> (literal, descrição); None fora dele
+        self.assuncoes = None
+        # Descrições das restrições em conflito da última execução inviável
+        self.diagnostico = []
+        
         # Variáveis de decisão
-        self.aulas_vars = {}  # (turma, disciplina, dia, horario) -> (professor, sala)
+        # (turma, disciplina, dia, horario) -> {'presenca': literal, 'professores': {professor: literal}}
+        self.aulas_vars = {}
+        # (turma, dia, horario) -> {classe de sala: literal}
+        self.salas_vars = {}
+        # Aulas geminadas: (turma, disciplina, dia, horário inicial) ->
+        # {'presenca': literal, 'professores': {professor: literal}, 'tamanho': aulas seguidas}
+        self.blocos_vars = {}
+        # (turma, disciplina) -> (inícios de bloco, nº de blocos, literais de aulas avulsas, nº de avulsas)
+        self.blocos_por_turma_disciplina = {}
         
     def obter_segmento_turma(self, turma_nome):
         """Determina o segmento da turma"""
@@ -41,59 +134,649 @@ class GradeHorariaORTools:
         try:
             self._criar_variaveis()
             self._adicionar_restricoes()
+            if self.otimizar or self.parcial:
+                self._adicionar_objetivo()
+            if self.grade_inicial:
+                self._aplicar_grade_inicial()
             
             # Resolver
-            status = self.solver.Solve(self.model)
+            if self.callback_progresso:
+                status = self.solver.Solve(self.model, ProgressoSolucao(self.callback_progresso))
+            else:
+                status = self.solver.Solve(self.model)
+            
+            self.estatisticas = {
+                "status": self.solver.StatusName(status),
+                "tempo": self.solver.WallTime(),
+                "objetivo": self.solver.ObjectiveValue(),
+                "limite": self.solver.BestObjectiveBound(),
+                "conflitos": self.solver.NumConflicts()
+            }
             
             if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-                return self._extrair_solucao()
+                aulas = self._extrair_solucao()
+                if self.modo_salas == "emparelhamento":
+                    sem_sala = atribuir_salas(
+                        aulas, self.turmas, self.disciplinas, self.salas, set(self.salas_fixas)
+                    )
+                    if sem_sala:
+                        st.warning(
+                            f"⚠️ {len(sem_sala)} aulas ficaram sem sala compatível; "
+                            "resolvendo novamente com escolha de salas no modelo."
+                        )
+                        self._reiniciar_modelo()
+                        self.modo_salas = "integrado"
+                        return self.gerar_grade()
+                return aulas
+            elif status == cp_model.UNKNOWN:
+                st.error("❌ Tempo limite atingido sem encontrar solução viável.")
+                return None
             else:
-                st.error(f"❌ Não foi possível encontrar solução. Status: {status}")
+                st.error(f"❌ Não foi possível encontrar solução. Status: {self.estatisticas['status']}")
+                if status == cp_model.INFEASIBLE:
+                    self.diagnostico = self.diagnosticar_inviabilidade()
+                    if self.diagnostico:
+                        st.error(
+                            "🔍 Restrições em conflito:\n" +
+                            "\n".join(f"- {descricao}" for descricao in self.diagnostico)
+                        )
                 return None
                 
         except Exception as e:
             st.error(f"❌ Erro no OR-Tools: {str(e)}")
             return None
     
+    def gerar_resultado(self):
+        """Gera a grade no modo parcial e devolve um ResultadoGrade
+        
+        Mesmo no tempo limite o resultado traz as aulas alocadas, as que
+        faltaram com o motivo e as estatísticas do solver. Se a grade parcial
+        é ótima mas incompleta, o modelo estrito é inviável: o núcleo de
+        diagnosticar_inviabilidade vira o motivo das aulas que faltaram.
+        """
+        parcial = self.parcial
+        self.parcial = True
+        try:
+            aulas = self.gerar_grade()
+        finally:
+            self.parcial = parcial
+        status = self.estatisticas.get("status")
+        if status == "OPTIMAL":
+            motivo = "Conflito com as outras aulas da turma, dos professores e das salas"
+        elif status is None:
+            motivo = "Erro no OR-Tools"
+        else:
+            motivo = "Tempo limite atingido antes de encaixar a aula"
+        estatisticas = {"algoritmo": "ortools", **self.estatisticas}
+        resultado = montar_resultado(
+            aulas, self.turmas, self.professores, self.disciplinas, self.salas,
+            estatisticas, motivo
+        )
+        
+        if status == "OPTIMAL" and not resultado.completa:
+            self.parcial = False
+            try:
+                nucleo = self.diagnosticar_inviabilidade()
+            finally:
+                self.parcial = parcial
+            if nucleo:
+                resultado.estatisticas["nucleo_inviabilidade"] = nucleo
+                motivo_nucleo = f"Grade inviável por: {'; '.join(nucleo)}"
+                for aula in resultado.nao_alocadas:
+                    if aula.motivo == motivo:
+                        aula.motivo = motivo_nucleo
+        return resultado
+    
+    def diagnosticar_inviabilidade(self):
+        """Lista professores, turmas e salas envolvidos na inviabilidade
+        
+        Remonta o modelo com as restrições de cada entidade condicionadas a um
+        literal de suposição; o núcleo devolvido por
+        SufficientAssumptionsForInfeasibility vira uma lista legível.
+        """
+        self._reiniciar_modelo()
+        self.assuncoes = {}
+        try:
+            self._criar_variaveis()
+            self._adicionar_restricoes()
+            if self.grade_inicial:
+                self._aplicar_grade_inicial()
+            self.model.AddAssumptions([literal for literal, _ in self.assuncoes.values()])
+            
+            # Núcleos de suposições exigem busca em uma única thread
+            solver = cp_model.CpSolver()
+            solver.parameters.num_search_workers = 1
+            if self.max_time_in_seconds:
+                solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+            
+            if solver.Solve(self.model) != cp_model.INFEASIBLE:
+                return []
+            
+            nucleo = set(solver.SufficientAssumptionsForInfeasibility())
+            return [
+                descricao for literal, descricao in self.assuncoes.values()
+                if literal.Index() in nucleo
+            ]
+        finally:
+            self.assuncoes = None
+    
+    def _condicao(self, chave, descricao):
+        """Literal de suposição da entidade no modo diagnóstico (None fora dele)"""
+        if self.assuncoes is None:
+            return None
+        if chave not in self.assuncoes:
+            self.assuncoes[chave] = (self.model.NewBoolVar(f'assuncao_{chave}'), descricao)
+        return self.assuncoes[chave][0]
+    
+    def _restringir(self, restricao, chave, descricao):
+        """Condiciona a restrição à suposição da entidade quando em diagnóstico"""
+        condicao = self._condicao(chave, descricao)
+        if condicao is not None:
+            restricao.OnlyEnforceIf(condicao)
+    
+    def _no_maximo_um(self, literais, chave, descricao):
+        """AddAtMostOne, ou a versão linear condicionada no modo diagnóstico"""
+        if self.assuncoes is None:
+            self.model.AddAtMostOne(literais)
+        else:
+            self._restringir(self.model.Add(sum(literais) <= 1), chave, descricao)
+    
+    def _reiniciar_modelo(self):
+        """Descarta o modelo e as variáveis para montar um novo"""
+        self.model = cp_model.CpModel()
+        self.aulas_vars = {}
+        self.salas_vars = {}
+        self.blocos_vars = {}
+        self.blocos_por_turma_disciplina = {}
+        self.aulas_faltantes = []
+    
+    def gerar_grade_decomposta(self, max_processos=None):
+        """Resolve em paralelo os componentes que não compartilham professores
+        
+        Turmas ligadas por algum professor apto formam um componente; cada um
+        vira um modelo próprio resolvido em outro processo. Na junção, as salas
+        repetidas no mesmo horário são redistribuídas e, se ainda houver
+        conflito, a grade é resolvida de uma vez só.
+        """
+        try:
+            componentes = componentes_independentes(self.turmas, self.professores, self.disciplinas)
+            if len(componentes) <= 1:
+                return self.gerar_grade()
+            
+            workers_por_componente = max(1, self.num_search_workers // len(componentes))
+            argumentos = []
+            for turmas_componente in componentes:
+                nomes = {turma.nome for turma in turmas_componente}
+                disciplinas_componente = [
+                    disc for disc in self.disciplinas if nomes.intersection(disc.turmas)
+                ]
+                nomes_disciplinas = {disc.nome for disc in disciplinas_componente}
+                professores_componente = [
+                    prof for prof in self.professores
+                    if nomes_disciplinas.intersection(prof.disciplinas)
+                ]
+                grade_inicial_componente = [
+                    aula for aula in self.grade_inicial if aula.turma in nomes
+                ]
+                argumentos.append((
+                    turmas_componente, professores_componente, disciplinas_componente, self.salas,
+                    {
+                        "dias_em_estendido": self.dias_em_estendido,
+                        "num_search_workers": workers_por_componente,
+                        "max_time_in_seconds": self.max_time_in_seconds,
+                        "relative_gap": self.relative_gap,
+                        "grade_inicial": grade_inicial_componente,
+                        "alteradas": self.alteradas,
+                        "modo_salas": self.modo_salas,
+                        "otimizar": self.otimizar,
+                        "pesos": self.pesos,
+                        "quebrar_simetrias": self.quebrar_simetrias,
+                        "parcial": self.parcial,
+                        "aulas_fixas": [fixa for fixa in self.aulas_fixas if fixa.turma in nomes]
+                    }
+                ))
+            
+            with ProcessPoolExecutor(max_workers=max_processos) as executor:
+                resultados = list(executor.map(_resolver_componente, argumentos))
+            
+            self.estatisticas = {
+                "status": "OPTIMAL",
+                "tempo": max(estatisticas.get("tempo", 0) for _, estatisticas in resultados),
+                "componentes": len(componentes)
+            }
+            
+            aulas = []
+            for aulas_componente, estatisticas in resultados:
+                if aulas_componente is None:
+                    self.estatisticas["status"] = estatisticas.get("status", "ERRO")
+                    st.error(
+                        f"❌ Não foi possível encontrar solução para um dos {len(componentes)} "
+                        f"componentes. Status: {self.estatisticas['status']}"
+                    )
+                    return None
+                if estatisticas["status"] != "OPTIMAL":
+                    self.estatisticas["status"] = estatisticas["status"]
+                aulas.extend(aulas_componente)
+            
+            if not self._conciliar_recursos(aulas):
+                st.warning("⚠️ Componentes disputam salas no mesmo horário; resolvendo a grade completa.")
+                return self.gerar_grade()
+            
+            return aulas
+            
+        except Exception as e:
+            st.error(f"❌ Erro no OR-Tools decomposto: {str(e)}")
+            return None
+    
+    def melhorar_grade(self, grade_atual, tempo_total=60.0, tempo_vizinhanca=5.0, semente=0):
+        """Busca em vizinhança grande (LNS) a partir de uma grade existente
+        
+        A cada iteração libera as aulas de um dia, de um professor ou de uma
+        turma sorteados, fixa o resto da grade atual e resolve esse modelo
+        menor com o objetivo pedagógico por até `tempo_vizinhanca` segundos.
+        A grade só é trocada quando o objetivo não piora; pode ser
+        interrompida a qualquer momento pelo `tempo_total`.
+        """
+        try:
+            rng = random.Random(semente)
+            inicio = time.time()
+            
+            # Tudo fixo: avalia a grade atual (e completa aulas que faltarem)
+            melhor, objetivo = self._resolver_vizinhanca(grade_atual, set(), tempo_vizinhanca)
+            if melhor is None:
+                st.error("❌ A grade atual não é compatível com os dados cadastrados.")
+                return None
+            objetivo_inicial = objetivo
+            
+            vizinhancas = {
+                "dia": list(DIAS_SEMANA),
+                "professor": sorted({aula.professor for aula in melhor}),
+                "turma": [turma.nome for turma in self.turmas]
+            }
+            iteracoes = melhorias = 0
+            while time.time() - inicio < tempo_total:
+                tipo = rng.choice(list(vizinhancas))
+                liberado = rng.choice(vizinhancas[tipo])
+                tempo = min(tempo_vizinhanca, tempo_total - (time.time() - inicio))
+                aulas, valor = self._resolver_vizinhanca(melhor, {liberado}, max(tempo, 0.1))
+                iteracoes += 1
+                if aulas is not None and valor <= objetivo:
+                    melhorias += valor < objetivo
+                    melhor, objetivo = aulas, valor
+                if self.callback_progresso:
+                    self.callback_progresso({
+                        "iteracao": iteracoes,
+                        "vizinhanca": f"{tipo} {liberado}",
+                        "objetivo": objetivo,
+                        "tempo": time.time() - inicio
+                    })
+            
+            self.estatisticas = {
+                "status": "LNS",
+                "tempo": time.time() - inicio,
+                "objetivo": objetivo,
+                "objetivo_inicial": objetivo_inicial,
+                "iteracoes": iteracoes,
+                "melhorias": melhorias
+            }
+            return melhor
+            
+        except Exception as e:
+            st.error(f"❌ Erro ao otimizar a grade: {str(e)}")
+            return None
+    
+    def _resolver_vizinhanca(self, grade, alteradas, tempo):
+        """Resolve o modelo com a grade fixa fora de `alteradas`; retorna (aulas, objetivo)"""
+        sub = GradeHorariaORTools(
+            self.turmas, self.professores, self.disciplinas, self.salas,
+            dias_em_estendido=self.dias_em_estendido,
+            num_search_workers=self.num_search_workers,
+            max_time_in_seconds=tempo,
+            grade_inicial=grade,
+            aulas_fixas=self.aulas_fixas,
+            alteradas=alteradas,
+            modo_salas=self.modo_salas,
+            otimizar=True,
+            pesos=self.pesos
+        )
+        sub._criar_variaveis()
+        sub._adicionar_restricoes()
+        sub._adicionar_objetivo()
+        sub._aplicar_grade_inicial()
+        # A grade de partida já é viável; o reparo da dica só atrasaria a busca
+        sub.solver.parameters.repair_hint = False
+        status = sub.solver.Solve(sub.model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None, None
+        
+        aulas = sub._extrair_solucao()
+        if sub.modo_salas == "emparelhamento" and atribuir_salas(
+            aulas, self.turmas, self.disciplinas, self.salas, set(sub.salas_fixas)
+        ):
+            return None, None
+        return aulas, sub.solver.ObjectiveValue()
+    
+    def _aplicar_grade_inicial(self):
+        """Usa a grade inicial como dica e fixa as aulas não afetadas pela alteração"""
+        aulas_iniciais = {
+            (aula.turma, aula.disciplina, aula.dia, aula.horario): aula
+            for aula in self.grade_inicial
+        }
+        
+        for key, var_info in self.aulas_vars.items():
+            aula = aulas_iniciais.get(key)
+            self.model.AddHint(var_info['presenca'], aula is not None)
+            if var_info['tamanho_bloco'] > 1:
+                continue  # Dica pelos blocos, abaixo
+            for prof_nome, (var,) in var_info['professores'].items():
+                if var is not var_info['presenca']:
+                    self.model.AddHint(var, aula is not None and aula.professor == prof_nome)
+        
+        # Blocos: aulas seguidas do mesmo professor, agrupadas a partir da primeira
+        cobertas = set()
+        for chave in sorted(self.blocos_vars):
+            info = self.blocos_vars[chave]
+            turma_nome, disc_nome, dia, inicio = chave
+            keys = [(turma_nome, disc_nome, dia, h) for h in range(inicio, inicio + info['tamanho'])]
+            aulas = [aulas_iniciais.get(key) for key in keys]
+            professores = {aula.professor if aula else None for aula in aulas}
+            professor = professores.pop() if len(professores) == 1 else None
+            usado = professor in info['professores'] and not cobertas.intersection(keys)
+            if usado:
+                cobertas.update(keys)
+            self.model.AddHint(info['presenca'], usado)
+            for prof_nome, var in info['professores'].items():
+                if var is not info['presenca']:
+                    self.model.AddHint(var, usado and prof_nome == professor)
+        
+        # A grade anterior pode ter ficado inviável; deixa o solver consertar a dica
+        self.solver.parameters.repair_hint = True
+        
+        salas_iniciais = {
+            (aula.turma, aula.dia, aula.horario): self.classe_da_sala.get(aula.sala)
+            for aula in self.grade_inicial
+        }
+        for slot_key, salas_vars in self.salas_vars.items():
+            for classe, var in salas_vars.items():
+                self.model.AddHint(var, salas_iniciais.get(slot_key) == classe)
+        
+        if self.alteradas is None:
+            return
+        
+        for key, aula in aulas_iniciais.items():
+            if self.alteradas.intersection((aula.turma, aula.professor, aula.disciplina, aula.dia)):
+                continue
+            var_info = self.aulas_vars.get(key)
+            if var_info is None or aula.professor not in var_info['professores']:
+                continue  # Aula deixou de ser possível; fica livre
+            fixas = [var_info['presenca'], sum(var_info['professores'][aula.professor])]
+            sala_var = self.salas_vars.get((aula.turma, aula.dia, aula.horario), {}).get(
+                self.classe_da_sala.get(aula.sala)
+            )
+            if sala_var is not None:
+                fixas.append(sala_var)
+            for expressao in fixas:
+                self._restringir(
+                    self.model.Add(expressao == 1), ("grade_fixa",), "Aulas mantidas fixas da grade anterior"
+                )
+    
+    def _conciliar_recursos(self, aulas):
+        """Confere choques de professor e redistribui salas repetidas por horário
+        
+        As aulas fixas com sala cadastrada mantêm essa sala na redistribuição.
+        """
+        ocupados = set()
+        salas_repetidas = False
+        for aula in aulas:
+            chave_prof = ("professor", aula.professor, aula.dia, aula.horario)
+            chave_sala = ("sala", aula.sala, aula.dia, aula.horario)
+            if chave_prof in ocupados:
+                return False
+            salas_repetidas = salas_repetidas or chave_sala in ocupados
+            ocupados.update((chave_prof, chave_sala))
+        
+        if salas_repetidas:
+            fixas = {
+                (fixa.turma, fixa.disciplina, fixa.dia, fixa.horario)
+                for fixa in self.aulas_fixas if fixa.sala
+            }
+            return not atribuir_salas(aulas, self.turmas, self.disciplinas, self.salas, fixas)
+        return True
+    
     def _criar_variaveis(self):
-        """Cria variáveis de decisão"""
+        """Cria variáveis de decisão booleanas
+        
+        Para cada aula possível (turma, disciplina, dia, horário) há um literal
+        de presença e, em 'professores', os literais de cada professor apto
+        naquele horário (um por professor; nas disciplinas geminadas, os dos
+        blocos que cobrem o horário). No modo integrado, cada horário ocupado
+        da turma recebe exatamente uma classe de salas.
+        """
+        self._agrupar_salas()
         for turma in self.turmas:
             turma_nome = turma.nome
             grupo_turma = turma.grupo
             horarios_turma = self.obter_horarios_turma(turma_nome)
             
-            # Disciplinas desta turma (do mesmo grupo)
+            # Disciplinas desta turma (do mesmo grupo) e salas compatíveis com cada uma
             disciplinas_turma = []
+            salas_disciplina = {}
             for disc in self.disciplinas:
                 if turma_nome in disc.turmas and disc.grupo == grupo_turma:
                     disciplinas_turma.append(disc)
+                    salas_disciplina[disc.nome] = [
+                        sala.nome for sala in self.salas
+                        if sala.nome in self.salas_da_classe and sala_compativel(sala, turma, disc)
+                    ]
+            salas_turma = [
+                sala.nome for sala in self.salas
+                if sala.nome in self.salas_da_classe and sala_compativel(sala, turma, None)
+            ]
             
-            for disc in disciplinas_turma:
-                for dia in DIAS_SEMANA:
-                    for horario in horarios_turma:
-                        # Verificar se é horário de intervalo
-                        if self._eh_horario_intervalo(turma_nome, horario):
-                            continue
-                            
+            for dia in DIAS_SEMANA:
+                for horario in horarios_turma:
+                    # Verificar se é horário de intervalo
+                    if self._eh_horario_intervalo(turma_nome, horario):
+                        continue
+                    
+                    presencas_slot = []
+                    for disc in disciplinas_turma:
                         # Professores que podem lecionar esta disciplina
                         professores_validos = []
+                        indisponiveis = []  # Só no diagnóstico: aptos, mas indisponíveis
                         for prof in self.professores:
                             if (disc.nome in prof.disciplinas and 
-                                prof.grupo in [grupo_turma, "AMBOS"] and
-                                self._professor_disponivel(prof, dia, horario)):
-                                professores_validos.append(prof.nome)
+                                prof.grupo in [grupo_turma, "AMBOS"]):
+                                if self._professor_disponivel(prof, dia, horario):
+                                    professores_validos.append(prof.nome)
+                                elif self.assuncoes is not None:
+                                    professores_validos.append(prof.nome)
+                                    indisponiveis.append(prof.nome)
+                        
+                        if not professores_validos or not salas_disciplina[disc.nome]:
+                            continue
                         
-                        # Salas disponíveis
-                        salas_validas = [sala.nome for sala in self.salas]
+                        key = (turma_nome, disc.nome, dia, horario)
+                        presenca = self.model.NewBoolVar(f'aula_{key}')
+                        self.aulas_vars[key] = {
+                            'presenca': presenca,
+                            'professores': {},
+                            'candidatos': professores_validos,
+                            'indisponiveis': indisponiveis,
+                            'tipo_sala': disc.tipo_sala,
+                            'tipo': disc.tipo,
+                            'tamanho_bloco': disc.tamanho_bloco
+                        }
+                        presencas_slot.append((presenca, disc))
+                        if disc.tamanho_bloco > 1:
+                            continue  # Professores escolhidos por bloco em _criar_blocos
                         
-                        if professores_validos and salas_validas:
-                            key = (turma_nome, disc.nome, dia, horario)
-                            self.aulas_vars[key] = {
-                                'professor': self.model.NewIntVar(0, len(professores_validos)-1, f'prof_{key}'),
-                                'sala': self.model.NewIntVar(0, len(salas_validas)-1, f'sala_{key}'),
-                                'professores_list': professores_validos,
-                                'salas_list': salas_validas
+                        # Aula presente <=> exatamente um professor escolhido
+                        self.aulas_vars[key]['professores'] = self._escolher_professor(
+                            presenca, f'prof_{key}', professores_validos, indisponiveis
+                        )
+                    
+                    if presencas_slot and self.modo_salas == "integrado":
+                        slot_key = (turma_nome, dia, horario)
+                        salas_vars = {
+                            sala_nome: self.model.NewBoolVar(f'sala_{slot_key}_{sala_nome}')
+                            for sala_nome in salas_turma
+                        }
+                        # Horário ocupado <=> exatamente uma sala
+                        self.model.Add(
+                            sum(salas_vars.values()) == sum(presenca for presenca, _ in presencas_slot)
+                        )
+                        # Disciplina presente => sala de um tipo compatível
+                        for presenca, disc in presencas_slot:
+                            if len(salas_disciplina[disc.nome]) < len(salas_turma):
+                                self.model.Add(
+                                    sum(salas_vars[sala_nome] for sala_nome in salas_disciplina[disc.nome])
+                                    >= presenca
+                                )
+                        self.salas_vars[slot_key] = salas_vars
+            
+            self._criar_blocos(turma, disciplinas_turma, horarios_turma, salas_disciplina)
+    
+    def _escolher_professor(self, presenca, nome, professores_validos, indisponiveis):
+        """Um literal por professor, com exatamente um escolhido quando `presenca` é verdadeiro
+        
+        Com um único professor possível o literal é a própria presença.
+        Retorna {professor: [literal]}, no formato de 'professores' das aulas.
+        """
+        if len(professores_validos) == 1:
+            professores_vars = {professores_validos[0]: presenca}
+        else:
+            professores_vars = {
+                prof_nome: self.model.NewBoolVar(f'{nome}_{prof_nome}')
+                for prof_nome in professores_validos
+            }
+            self.model.Add(sum(professores_vars.values()) == presenca)
+        for prof_nome in indisponiveis:
+            self._restringir(
+                self.model.Add(professores_vars[prof_nome] == 0),
+                ("professor", prof_nome),
+                f"Professor {prof_nome}: disponibilidade e uma aula por horário"
+            )
+        return {prof_nome: [var] for prof_nome, var in professores_vars.items()}
+    
+    def _criar_blocos(self, turma, disciplinas_turma, horarios_turma, salas_disciplina):
+        """Aulas geminadas: o bloco é a variável de decisão
+        
+        Cada início possível (horários seguidos, sem o intervalo) tem um literal
+        de bloco, um literal por professor apto em todo o bloco e, no modo
+        integrado, um por classe de salas compatível. Os horários não têm
+        literais de professor próprios: o professor de cada horário são os
+        literais dos blocos que o cobrem. A aula de cada horário fica igual à
+        soma desses blocos mais uma aula avulsa, usada só quando a carga não é
+        múltipla do tamanho do bloco.
+        """
+        for disc in disciplinas_turma:
+            tamanho = disc.tamanho_bloco
+            if tamanho <= 1:
+                continue
+            num_blocos, num_avulsas = divmod(disc.carga_semanal, tamanho)
+            inicios = []
+            avulsas = []
+            
+            for dia in DIAS_SEMANA:
+                cobertura = defaultdict(list)  # horário -> blocos que o cobrem
+                for inicio in horarios_turma:
+                    keys = [(turma.nome, disc.nome, dia, h) for h in range(inicio, inicio + tamanho)]
+                    if not all(key in self.aulas_vars for key in keys):
+                        continue  # Passa do último horário, do intervalo ou de horário impossível
+                    professores = set.intersection(
+                        *(set(self.aulas_vars[key]['candidatos']) for key in keys)
+                    )
+                    if not professores:
+                        continue
+                    
+                    chave = (turma.nome, disc.nome, dia, inicio)
+                    bloco = self.model.NewBoolVar(f'bloco_{chave}')
+                    indisponiveis = set().union(
+                        *(self.aulas_vars[key]['indisponiveis'] for key in keys)
+                    )
+                    # Bloco presente <=> um professor para todas as aulas do bloco
+                    professores_vars = {
+                        prof_nome: literais[0] for prof_nome, literais in self._escolher_professor(
+                            bloco, f'bloco_{chave}', sorted(professores), indisponiveis & professores
+                        ).items()
+                    }
+                    for key in keys:
+                        for prof_nome, var in professores_vars.items():
+                            self.aulas_vars[key]['professores'].setdefault(prof_nome, []).append(var)
+                        cobertura[key[3]].append(bloco)
+                    
+                    # Mesma classe de sala do início ao fim do bloco
+                    salas_vars = {}
+                    if self.modo_salas == "integrado":
+                        classes = salas_disciplina[disc.nome]
+                        if len(classes) == 1:
+                            salas_vars = {classes[0]: bloco}
+                        else:
+                            salas_vars = {
+                                classe: self.model.NewBoolVar(f'bloco_{chave}_sala_{classe}')
+                                for classe in classes
                             }
+                            self.model.Add(sum(salas_vars.values()) == bloco)
+                        for key in keys:
+                            salas_horario = self.salas_vars[(turma.nome, dia, key[3])]
+                            for classe, var in salas_vars.items():
+                                self.model.AddImplication(var, salas_horario[classe])
+                    
+                    self.blocos_vars[chave] = {
+                        'presenca': bloco,
+                        'professores': professores_vars,
+                        'salas': salas_vars,
+                        'tamanho': tamanho
+                    }
+                    inicios.append(bloco)
+                
+                for horario in horarios_turma:
+                    key = (turma.nome, disc.nome, dia, horario)
+                    if key not in self.aulas_vars:
+                        continue
+                    var_info = self.aulas_vars[key]
+                    if num_avulsas:
+                        avulsa = self.model.NewBoolVar(f'avulsa_{key}')
+                        avulsas.append(avulsa)
+                        self.model.Add(var_info['presenca'] == sum(cobertura[horario]) + avulsa)
+                        professores_avulsa = self._escolher_professor(
+                            avulsa, f'avulsa_{key}', var_info['candidatos'], var_info['indisponiveis']
+                        )
+                        for prof_nome, literais in professores_avulsa.items():
+                            var_info['professores'].setdefault(prof_nome, []).extend(literais)
+                    else:
+                        self.model.Add(var_info['presenca'] == sum(cobertura[horario]))
+            
+            self.blocos_por_turma_disciplina[(turma.nome, disc.nome)] = (
+                inicios, num_blocos, avulsas, num_avulsas
+            )
+    
+    def _agrupar_salas(self):
+        """Agrupa salas de mesmo tipo e capacidade, que são intercambiáveis
+        
+        Salas de aulas fixas ficam em classe própria: assim a classe garante
+        que um bloco geminado encontra a mesma sala livre até o fim.
+        """
+        self.classe_da_sala = {}
+        self.salas_da_classe = {}
+        representantes = {}
+        salas_fixas = {fixa.sala for fixa in self.aulas_fixas if fixa.sala}
+        for sala in self.salas:
+            intercambiavel = self.quebrar_simetrias and sala.nome not in salas_fixas
+            chave = (sala.tipo, sala.capacidade) if intercambiavel else sala.nome
+            classe = representantes.setdefault(chave, sala.nome)
+            self.classe_da_sala[sala.nome] = classe
+            self.salas_da_classe.setdefault(classe, []).append(sala.nome)
+    
+    def _posicao_recreio(self, turma_nome, horario):
+        """Horário na escala do neuro_rules, que tem o recreio na posição 4
+        
+        No EF II o intervalo é o 3º horário: cada horário sobe uma posição.
+        """
+        if self.obter_segmento_turma(turma_nome) == "EF_II":
+            return horario + 1
+        return horario
     
     def _eh_horario_intervalo(self, turma_nome, horario):
         """Verifica se é horário de intervalo"""
@@ -127,87 +810,358 @@ class GradeHorariaORTools:
     
     def _adicionar_restricoes(self):
         """Adiciona restrições ao modelo"""
+        self._indexar_variaveis()
         self._adicionar_restricao_uma_aula_por_turma_horario()
         self._adicionar_restricao_professor_uma_aula_por_horario()
         self._adicionar_restricao_sala_uma_aula_por_horario()
         self._adicionar_restricao_carga_horaria()
+        self._adicionar_restricao_blocos()
+        self._fixar_aulas_fixas()
+        if self.modo_salas == "emparelhamento":
+            self._adicionar_restricao_capacidade_salas()
+        if self.quebrar_simetrias and self.alteradas is None and self.assuncoes is None:
+            self._adicionar_ordem_professores_equivalentes()
+    
+    def _indexar_variaveis(self):
+        """Agrupa os literais por turma, professor e sala em uma única passada"""
+        self.vars_por_turma_horario = defaultdict(list)  # (turma, dia, horario) -> presenças
+        self.vars_por_professor_horario = defaultdict(list)  # (professor, dia, horario) -> literais
+        self.vars_por_sala_horario = defaultdict(list)  # (classe de sala, dia, horario) -> literais
+        self.vars_por_turma_disciplina = defaultdict(list)  # (turma, disciplina) -> presenças
+        self.vars_por_horario = defaultdict(list)  # (dia, horario) -> (presença, tipo de sala)
+        
+        for (turma_nome, disc_nome, dia, horario), var_info in self.aulas_vars.items():
+            self.vars_por_horario[(dia, horario)].append((var_info['presenca'], var_info['tipo_sala']))
+            self.vars_por_turma_horario[(turma_nome, dia, horario)].append(var_info['presenca'])
+            self.vars_por_turma_disciplina[(turma_nome, disc_nome)].append(var_info['presenca'])
+            for prof_nome, literais in var_info['professores'].items():
+                self.vars_por_professor_horario[(prof_nome, dia, horario)].extend(literais)
+        
+        for (turma_nome, dia, horario), salas_vars in self.salas_vars.items():
+            for classe, var in salas_vars.items():
+                self.vars_por_sala_horario[(classe, dia, horario)].append(var)
     
     def _adicionar_restricao_uma_aula_por_turma_horario(self):
         """Cada turma tem no máximo uma aula por horário"""
-        for turma in self.turmas:
-            turma_nome = turma.nome
-            horarios_turma = self.obter_horarios_turma(turma_nome)
-            
-            for dia in DIAS_SEMANA:
-                for horario in horarios_turma:
-                    aulas_no_horario = []
-                    for key in self.aulas_vars:
-                        if key[0] == turma_nome and key[2] == dia and key[3] == horario:
-                            aulas_no_horario.append(1)  # Usar constante 1 para indicar presença
-                    
-                    if aulas_no_horario:
-                        self.model.Add(sum(aulas_no_horario) <= 1)
+        for aulas_no_horario in self.vars_por_turma_horario.values():
+            if len(aulas_no_horario) > 1:
+                self.model.AddAtMostOne(aulas_no_horario)
     
     def _adicionar_restricao_professor_uma_aula_por_horario(self):
         """Cada professor tem no máximo uma aula por horário"""
-        for prof in self.professores:
-            for dia in DIAS_SEMANA:
-                for horario in range(1, 8):  # Todos horários possíveis 1-7
-                    aulas_prof = []
-                    for key, var_info in self.aulas_vars.items():
-                        if (key[2] == dia and key[3] == horario and 
-                            prof.nome in var_info['professores_list']):
-                            # Adicionar variável indicadora se este professor foi escolhido
-                            prof_index = var_info['professores_list'].index(prof.nome)
-                            aulas_prof.append(var_info['professor'] == prof_index)
-                    
-                    if aulas_prof:
-                        self.model.Add(sum(aulas_prof) <= 1)
+        for (prof_nome, _, _), aulas_prof in self.vars_por_professor_horario.items():
+            if len(aulas_prof) > 1:
+                self._no_maximo_um(
+                    aulas_prof,
+                    ("professor", prof_nome),
+                    f"Professor {prof_nome}: disponibilidade e uma aula por horário"
+                )
     
     def _adicionar_restricao_sala_uma_aula_por_horario(self):
-        """Cada sala tem no máximo uma aula por horário"""
+        """Cada classe de salas tem no máximo uma aula por sala em cada horário"""
+        for (classe, _, _), aulas_sala in self.vars_por_sala_horario.items():
+            salas_classe = self.salas_da_classe[classe]
+            if len(aulas_sala) <= len(salas_classe):
+                continue
+            if len(salas_classe) == 1:
+                self._no_maximo_um(
+                    aulas_sala, ("sala", classe), f"Sala {classe}: uma aula por horário"
+                )
+            else:
+                self._restringir(
+                    self.model.Add(sum(aulas_sala) <= len(salas_classe)),
+                    ("sala", classe),
+                    f"Salas {', '.join(salas_classe)}: uma aula por sala e horário"
+                )
+    
+    def _fixar_aulas_fixas(self):
+        """Fixa em 1 os literais de presença, professor e sala das aulas fixas"""
+        nomes_turmas = {turma.nome for turma in self.turmas}
+        self.salas_fixas = {}
+        ocupados = set()
+        for fixa in self.aulas_fixas:
+            if fixa.turma not in nomes_turmas:
+                continue
+            key = (fixa.turma, fixa.disciplina, fixa.dia, fixa.horario)
+            var_info = self.aulas_vars.get(key)
+            recursos = {
+                (tipo, nome, fixa.dia, fixa.horario)
+                for tipo, nome in (("turma", fixa.turma), ("professor", fixa.professor), ("sala", fixa.sala))
+                if nome
+            }
+            if var_info is None or fixa.professor not in var_info['professores'] or recursos & ocupados:
+                st.warning(
+                    f"⚠️ Aula fixa de {fixa.disciplina} para {fixa.turma} ({fixa.dia} {fixa.horario}º) "
+                    "não é possível com os dados cadastrados e foi ignorada"
+                )
+                continue
+            
+            ocupados |= recursos
+            expressoes = [var_info['presenca'], sum(var_info['professores'][fixa.professor])]
+            if fixa.sala and self.modo_salas == "emparelhamento":
+                # Sem variáveis de sala: a sala fixa é reservada no emparelhamento
+                if fixa.sala in self.classe_da_sala:
+                    self.salas_fixas[key] = fixa.sala
+            elif fixa.sala:
+                sala_var = self.salas_vars.get((fixa.turma, fixa.dia, fixa.horario), {}).get(
+                    self.classe_da_sala.get(fixa.sala)
+                )
+                if sala_var is not None:
+                    expressoes.append(sala_var)
+                    self.salas_fixas[key] = fixa.sala
+            for expressao in expressoes:
+                self._restringir(self.model.Add(expressao == 1), ("aulas_fixas",), "Aulas fixas cadastradas")
+    
+    def _adicionar_ordem_professores_equivalentes(self):
+        """Ordena pela carga total os professores com as mesmas disciplinas e horários
+        
+        Trocar as aulas de dois professores equivalentes não muda a grade nem o
+        objetivo; exigir carga não crescente na ordem do cadastro corta essas
+        permutações da busca.
+        """
+        carga_professor = defaultdict(list)
+        for (prof_nome, _, _), literais in self.vars_por_professor_horario.items():
+            carga_professor[prof_nome].extend(literais)
+        
+        # Professores com aulas fixas deixam de ser intercambiáveis
+        professores_fixos = {fixa.professor for fixa in self.aulas_fixas}
+        
+        classes = defaultdict(list)
+        for prof in self.professores:
+            if prof.nome in carga_professor and prof.nome not in professores_fixos:
+                chave = (
+                    frozenset(prof.disciplinas), prof.grupo,
+                    frozenset(prof.disponibilidade), frozenset(prof.horarios_indisponiveis)
+                )
+                classes[chave].append(prof.nome)
+        
+        for nomes in classes.values():
+            for anterior, seguinte in zip(nomes, nomes[1:]):
+                self.model.Add(sum(carga_professor[anterior]) >= sum(carga_professor[seguinte]))
+    
+    def _adicionar_restricao_capacidade_salas(self):
+        """Sem variáveis de sala: limita as aulas por horário ao número de salas de cada tipo
+        
+        As salas das aulas fixas ficam reservadas: saem da conta do seu tipo
+        no horário, assim como as aulas que as ocupam.
+        """
+        salas_por_tipo = defaultdict(int)
+        tipo_da_sala = {}
         for sala in self.salas:
-            sala_nome = sala.nome
-            for dia in DIAS_SEMANA:
-                for horario in range(1, 8):
-                    aulas_sala = []
-                    for key, var_info in self.aulas_vars.items():
-                        if (key[2] == dia and key[3] == horario and
-                            sala_nome in var_info['salas_list']):
-                            sala_index = var_info['salas_list'].index(sala_nome)
-                            aulas_sala.append(var_info['sala'] == sala_index)
-                    
-                    if aulas_sala:
-                        self.model.Add(sum(aulas_sala) <= 1)
+            salas_por_tipo[sala.tipo] += 1
+            tipo_da_sala[sala.nome] = sala.tipo
+        
+        presencas_fixas = defaultdict(set)  # (dia, horario) -> índices das presenças com sala fixa
+        reservadas = defaultdict(lambda: defaultdict(int))  # (dia, horario) -> tipo -> salas fixas
+        for key, sala in self.salas_fixas.items():
+            _, _, dia, horario = key
+            presencas_fixas[(dia, horario)].add(self.aulas_vars[key]['presenca'].Index())
+            reservadas[(dia, horario)][tipo_da_sala[sala]] += 1
+        
+        for (dia, horario), aulas_horario in self.vars_por_horario.items():
+            if len(aulas_horario) > len(self.salas):
+                self._restringir(
+                    self.model.Add(sum(presenca for presenca, _ in aulas_horario) <= len(self.salas)),
+                    ("salas",),
+                    f"Total de {len(self.salas)} salas por horário"
+                )
+            
+            por_tipo = defaultdict(list)
+            for presenca, tipo_sala in aulas_horario:
+                if tipo_sala and presenca.Index() not in presencas_fixas[(dia, horario)]:
+                    por_tipo[tipo_sala].append(presenca)
+            for tipo_sala, presencas in por_tipo.items():
+                livres = salas_por_tipo[tipo_sala] - reservadas[(dia, horario)][tipo_sala]
+                if len(presencas) > livres:
+                    self._restringir(
+                        self.model.Add(sum(presencas) <= livres),
+                        ("salas", tipo_sala),
+                        f"{salas_por_tipo[tipo_sala]} salas do tipo {tipo_sala} por horário"
+                    )
     
     def _adicionar_restricao_carga_horaria(self):
-        """Garante que cada disciplina tenha sua carga horária atendida"""
+        """Garante que cada disciplina tenha sua carga horária atendida (no máximo, no modo parcial)"""
         for turma in self.turmas:
             turma_nome = turma.nome
             grupo_turma = turma.grupo
             
             for disc in self.disciplinas:
                 if turma_nome in disc.turmas and disc.grupo == grupo_turma:
-                    aulas_disc = []
-                    for key in self.aulas_vars:
-                        if key[0] == turma_nome and key[1] == disc.nome:
-                            aulas_disc.append(1)  # Constante 1 para cada aula
+                    aulas_disc = self.vars_por_turma_disciplina.get((turma_nome, disc.nome), [])
+                    
+                    if self.parcial:
+                        self.model.Add(sum(aulas_disc) <= disc.carga_semanal)
+                        self.aulas_faltantes.append(disc.carga_semanal - sum(aulas_disc))
+                        continue
                     
-                    if aulas_disc:
-                        self.model.Add(sum(aulas_disc) == disc.carga_semanal)
+                    # Sem nenhuma aula possível a carga não pode ser atendida
+                    self._restringir(
+                        self.model.Add(sum(aulas_disc) == disc.carga_semanal),
+                        ("carga", turma_nome, disc.nome),
+                        f"Turma {turma_nome}: {disc.carga_semanal} aulas de {disc.nome}"
+                    )
+    
+    def _adicionar_restricao_blocos(self):
+        """Número de blocos e de avulsas das aulas geminadas e NoOverlap dos blocos
+        
+        Cada bloco vira um intervalo opcional de tamanho fixo na linha do tempo
+        da semana (dia * 10 + horário); os intervalos de uma turma, os de cada
+        professor e os de cada sala não se sobrepõem (numa classe de salas
+        intercambiáveis, no máximo uma por sala da classe ao mesmo tempo).
+        """
+        for (turma_nome, disc_nome), dados in self.blocos_por_turma_disciplina.items():
+            inicios, num_blocos, avulsas, num_avulsas = dados
+            for literais, quantidade in ((inicios, num_blocos), (avulsas, num_avulsas)):
+                if self.parcial:
+                    self.model.Add(sum(literais) <= quantidade)
+                else:
+                    self._restringir(
+                        self.model.Add(sum(literais) == quantidade),
+                        ("carga", turma_nome, disc_nome),
+                        f"Turma {turma_nome}: {num_blocos} blocos de {disc_nome}"
+                    )
+        
+        intervalos_turma = defaultdict(list)
+        intervalos_professor = defaultdict(list)
+        intervalos_sala = defaultdict(list)
+        for (turma_nome, disc_nome, dia, inicio), info in self.blocos_vars.items():
+            posicao = DIAS_SEMANA.index(dia) * 10 + inicio
+            nome = f'{turma_nome}_{disc_nome}_{dia}_{inicio}'
+            intervalos_turma[turma_nome].append(self.model.NewOptionalFixedSizeIntervalVar(
+                posicao, info['tamanho'], info['presenca'], f'intervalo_{nome}'
+            ))
+            for prof_nome, var in info['professores'].items():
+                intervalos_professor[prof_nome].append(self.model.NewOptionalFixedSizeIntervalVar(
+                    posicao, info['tamanho'], var, f'intervalo_{nome}_{prof_nome}'
+                ))
+            for classe, var in info['salas'].items():
+                intervalos_sala[classe].append(self.model.NewOptionalFixedSizeIntervalVar(
+                    posicao, info['tamanho'], var, f'intervalo_{nome}_sala_{classe}'
+                ))
+        
+        for intervalos in list(intervalos_turma.values()) + list(intervalos_professor.values()):
+            if len(intervalos) > 1:
+                self.model.AddNoOverlap(intervalos)
+        for classe, intervalos in intervalos_sala.items():
+            capacidade = len(self.salas_da_classe[classe])
+            if len(intervalos) <= capacidade:
+                continue
+            if capacidade == 1:
+                self.model.AddNoOverlap(intervalos)
+            else:
+                self.model.AddCumulative(intervalos, [1] * len(intervalos), capacidade)
+    
+    def _adicionar_objetivo(self):
+        """Minimiza as aulas faltantes (modo parcial) e depois as penalidades pedagógicas"""
+        termos, limite = self._termos_pedagogicos() if self.otimizar else ([], 0)
+        if self.parcial and self.aulas_faltantes:
+            # Peso acima de qualquer soma de penalidades: alocar aulas vem primeiro
+            termos.append((limite + 1) * sum(self.aulas_faltantes))
+        if termos:
+            self.model.Minimize(sum(termos))
+    
+    def _termos_pedagogicos(self):
+        """Termos de horários não ideais, janelas de professores e repetições no dia
+        
+        Retorna os termos e o maior valor que a soma deles pode atingir.
+        """
+        termos = []
+        limite = 0
+        
+        # Horários ideais por tipo de disciplina (neuro_rules)
+        repeticoes = defaultdict(list)  # (turma, disciplina, dia) -> presenças
+        tamanhos = {}  # (turma, disciplina, dia) -> aulas permitidas no dia sem penalidade
+        for (turma_nome, disc_nome, dia, horario), var_info in self.aulas_vars.items():
+            if not eh_horario_ideal(var_info['tipo'], self._posicao_recreio(turma_nome, horario)):
+                termos.append(self.pesos["horario_nao_ideal"] * var_info['presenca'])
+                limite += self.pesos["horario_nao_ideal"]
+            repeticoes[(turma_nome, disc_nome, dia)].append(var_info['presenca'])
+            tamanhos[(turma_nome, disc_nome, dia)] = var_info['tamanho_bloco']
+        
+        # Aulas além da primeira (ou do primeiro bloco) da mesma disciplina no dia
+        for key, presencas in repeticoes.items():
+            if len(presencas) > tamanhos[key]:
+                maximo = len(presencas) - tamanhos[key]
+                excesso = self.model.NewIntVar(0, maximo, f'repeticao_{key}')
+                self.model.Add(excesso >= sum(presencas) - tamanhos[key])
+                termos.append(self.pesos["repeticao_dia"] * excesso)
+                limite += self.pesos["repeticao_dia"] * maximo
+        
+        # Janelas: horário livre com aula do mesmo professor antes e depois no dia
+        horarios_professor = defaultdict(dict)  # (professor, dia) -> {horario: ocupado}
+        for (prof_nome, dia, horario), literais in self.vars_por_professor_horario.items():
+            ocupado = self.model.NewBoolVar(f'ocupado_{prof_nome}_{dia}_{horario}')
+            self.model.Add(sum(literais) == ocupado)
+            horarios_professor[(prof_nome, dia)][horario] = ocupado
+        
+        for (prof_nome, dia), ocupados in horarios_professor.items():
+            horarios = sorted(ocupados)
+            for i in range(1, len(horarios) - 1):
+                horario = horarios[i]
+                antes = self.model.NewBoolVar(f'antes_{prof_nome}_{dia}_{horario}')
+                depois = self.model.NewBoolVar(f'depois_{prof_nome}_{dia}_{horario}')
+                self.model.AddMaxEquality(antes, [ocupados[h] for h in horarios[:i]])
+                self.model.AddMaxEquality(depois, [ocupados[h] for h in horarios[i + 1:]])
+                janela = self.model.NewBoolVar(f'janela_{prof_nome}_{dia}_{horario}')
+                self.model.Add(janela >= antes + depois - ocupados[horario] - 1)
+                termos.append(self.pesos["janela_professor"] * janela)
+                limite += self.pesos["janela_professor"]
+        
+        return termos, limite
     
     def _extrair_solucao(self):
         """Extrai a solução do solver"""
         aulas = []
+        salas_usadas = defaultdict(set)  # (dia, horario) -> salas já entregues
+        for (_, _, dia, horario), sala in self.salas_fixas.items():
+            salas_usadas[(dia, horario)].add(sala)
         
-        for key, var_info in self.aulas_vars.items():
-            turma_nome, disc_nome, dia, horario = key
+        # Aulas que continuam um bloco geminado herdam a sala da anterior
+        continuacoes = {}  # key -> key da aula anterior do bloco
+        for (turma_nome, disc_nome, dia, inicio), info in self.blocos_vars.items():
+            if self.solver.Value(info['presenca']):
+                for horario in range(inicio + 1, inicio + info['tamanho']):
+                    continuacoes[(turma_nome, disc_nome, dia, horario)] = (
+                        turma_nome, disc_nome, dia, horario - 1
+                    )
+        salas_aulas = {}  # key -> sala entregue
+        
+        # Em ordem de horário, continuações antes das aulas que começam no horário
+        ordem = sorted(
+            self.aulas_vars,
+            key=lambda key: (DIAS_SEMANA.index(key[2]), key[3], key not in continuacoes)
+        )
+        for key in ordem:
+            var_info = self.aulas_vars[key]
+            if not self.solver.Value(var_info['presenca']):
+                continue
             
-            prof_index = self.solver.Value(var_info['professor'])
-            sala_index = self.solver.Value(var_info['sala'])
+            turma_nome, disc_nome, dia, horario = key
             
-            professor = var_info['professores_list'][prof_index]
-            sala = var_info['salas_list'][sala_index]
+            professor = next(
+                prof_nome for prof_nome, literais in var_info['professores'].items()
+                if any(self.solver.Value(var) for var in literais)
+            )
+            classe = next(
+                (classe for classe, var in self.salas_vars.get((turma_nome, dia, horario), {}).items()
+                 if self.solver.Value(var)),
+                None
+            )
+            if classe is None:
+                # Modo emparelhamento: sala atribuída depois, exceto a das aulas fixas
+                sala = self.salas_fixas.get(key, "")
+            else:
+                # Salas da mesma classe são intercambiáveis; entrega uma livre
+                sala = self.salas_fixas.get(key)
+                anterior = salas_aulas.get(continuacoes.get(key))
+                if not sala and anterior not in salas_usadas[(dia, horario)]:
+                    sala = anterior
+                sala = sala or next(
+                    sala_nome for sala_nome in self.salas_da_classe[classe]
+                    if sala_nome not in salas_usadas[(dia, horario)]
+                )
+                salas_usadas[(dia, horario)].add(sala)
+                salas_aulas[key] = sala
             
             # Obter grupo da turma
             turma_grupo = next((t.grupo for t in self.turmas if t.nome == turma_nome), "A")
@@ -227,4 +1181,37 @@ class GradeHorariaORTools:
             )
             aulas.append(aula)
         
-        return aulas
\ No newline at end of file
+        return aulas
+
+
+def componentes_independentes(turmas, professores, disciplinas):
+    """Agrupa as turmas que compartilham algum professor apto (union-find)"""
+    pai = {}
+    
+    def raiz(no):
+        pai.setdefault(no, no)
+        while pai[no] != no:
+            pai[no] = pai[pai[no]]
+            no = pai[no]
+        return no
+    
+    for turma in turmas:
+        raiz(("turma", turma.nome))
+        for disc in disciplinas:
+            if turma.nome not in disc.turmas or disc.grupo != turma.grupo:
+                continue
+            for prof in professores:
+                if disc.nome in prof.disciplinas and prof.grupo in [turma.grupo, "AMBOS"]:
+                    pai[raiz(("turma", turma.nome))] = raiz(("professor", prof.nome))
+    
+    componentes = defaultdict(list)
+    for turma in turmas:
+        componentes[raiz(("turma", turma.nome))].append(turma)
+    return list(componentes.values())
+
+
+def _resolver_componente(argumentos):
+    """Resolve um componente em um processo separado (usado por gerar_grade_decomposta)"""
+    turmas, professores, disciplinas, salas, opcoes = argumentos
+    scheduler = GradeHorariaORTools(turmas, professores, disciplinas, salas, **opcoes)
+    return scheduler.gerar_grade(), scheduler.estatisticas
@@ -1,5 +1,7 @@
 import streamlit as st
-from database import carregar_disciplinas, carregar_professores, carregar_turmas, carregar_salas
+from auto_save import registrar_estado_salvo
+from database import carregar_tudo
+from historico_grades import carregar_versao, listar_versoes
 
 def init_session_state():
     """Inicializa o session state com dados do banco"""
@@ -7,14 +9,27 @@ def init_session_state():
     if 'initialized' not in st.session_state:
         st.session_state.initialized = True
         
-        # Carregar dados do banco
-        st.session_state.disciplinas = carregar_disciplinas()
-        st.session_state.professores = carregar_professores() 
-        st.session_state.turmas = carregar_turmas()
-        st.session_state.salas = carregar_salas()
+        # Carregar dados do banco (uma só leitura, com cache entre sessões)
+        dados = carregar_tudo()
+        st.session_state.disciplinas = dados["disciplinas"]
+        st.session_state.professores = dados["professores"]
+        st.session_state.turmas = dados["turmas"]
+        st.session_state.salas = dados["salas"]
+        st.session_state.aulas_fixas = dados["aulas_fixas"]
+        registrar_estado_salvo(dados["versoes"])
         
-        # Estado para grade gerada
+        # Estado para grade gerada: começa pela última versão salva, se houver
         if 'grade_gerada' not in st.session_state:
             st.session_state.grade_gerada = None
+            st.session_state.turmas_grade = []
+            ultimas = listar_versoes(limite=1)
+            if ultimas:
+                aulas, turmas_versao = carregar_versao(ultimas[0]["versao"])
+                st.session_state.grade_gerada = aulas
+                st.session_state.turmas_grade = [
+                    t for t in st.session_state.turmas if t.nome in turmas_versao
+                ]
         if 'turmas_grade' not in st.session_state:
-            st.session_state.turmas_grade = []
\ No newline at end of file
+            st.session_state.turmas_grade = []
+        if 'relatorio_grade' not in st.session_state:
+            st.session_state.relatorio_grade = None
\ No newline at end of file
@@ -1,14 +1,44 @@
 import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from alocacao_salas import sala_compativel
 from models import Aula, DIAS_SEMANA, HORARIOS_EFII, HORARIOS_EM, HORARIOS_REAIS
+from viabilidade import montar_resultado
 import streamlit as st
 
+# Iterações do reparo por segundo de `tempo_reparo` nas execuções com semente,
+# que contam iterações em vez de tempo para o resultado não depender da máquina
+ITERACOES_REPARO_POR_SEGUNDO = 1000
+
 class SimpleGradeHoraria:
-    def __init__(self, turmas, professores, disciplinas, salas, dias_em_estendido=None):
+    def __init__(self, turmas, professores, disciplinas, salas, dias_em_estendido=None,
+                 estrategia="aleatoria", tempo_reparo=5.0, semente=None, exibir_avisos=True,
+                 aulas_fixas=None):
         self.turmas = turmas
         self.professores = professores
         self.disciplinas = disciplinas
         self.salas = salas
         self.dias_em_estendido = dias_em_estendido or []
+        self.estrategia = estrategia  # "aleatoria" ou "mais_restrita"
+        self.tempo_reparo = tempo_reparo  # segundos para a busca de reparo (0 desativa; com semente vira iterações)
+        self.semente = semente
+        self.exibir_avisos = exibir_avisos
+        
+        # Aulas fixadas de antemão (AulaFixa): entram na grade antes da busca
+        # e nunca são movidas pelo reparo
+        self.aulas_fixas = aulas_fixas or []
+        self.ids_fixas = set()
+        self.carga_fixa = Counter()  # (turma, disciplina) -> aulas fixas
+        
+        # Sem semente, usa o gerador global do módulo random
+        self.rng = random.Random(semente) if semente is not None else random
+        
+        # Índices de ocupação: (dia, horario) -> {nome: aula}
+        self._inicializar_ocupacao()
+        
+        # Aulas que não puderam ser alocadas: [(turma, disciplina)]
+        self.aulas_nao_alocadas = []
         
     def obter_segmento_turma(self, turma_nome):
         """Determina o segmento da turma"""
@@ -39,8 +69,40 @@ class SimpleGradeHoraria:
             return horario == 4  # EM: intervalo no 4º horário
         return False
     
-    def _professor_disponivel(self, professor, dia, horario, aulas_alocadas):
+    def _inicializar_ocupacao(self):
+        """Zera os índices de ocupação de turmas, professores e salas"""
+        self.ocupacao_turmas = defaultdict(dict)
+        self.ocupacao_professores = defaultdict(dict)
+        self.ocupacao_salas = defaultdict(dict)
+    
+    def _registrar_aula(self, aula):
+        """Marca turma, professor e sala da aula como ocupados no horário"""
+        slot = (aula.dia, aula.horario)
+        self.ocupacao_turmas[slot][aula.turma] = aula
+        self.ocupacao_professores[slot][aula.professor] = aula
+        self.ocupacao_salas[slot][aula.sala] = aula
+    
+    def _remover_aula(self, aula):
+        """Libera turma, professor e sala ocupados pela aula"""
+        slot = (aula.dia, aula.horario)
+        del self.ocupacao_turmas[slot][aula.turma]
+        del self.ocupacao_professores[slot][aula.professor]
+        del self.ocupacao_salas[slot][aula.sala]
+    
+    def _turma_ocupada(self, turma_nome, dia, horario):
+        """Verifica se a turma já tem aula no horário"""
+        return turma_nome in self.ocupacao_turmas[(dia, horario)]
+    
+    def _professor_disponivel(self, professor, dia, horario):
         """Verifica se professor está disponível no horário"""
+        if not self._professor_apto(professor, dia, horario):
+            return False
+        
+        # Verificar se professor já tem aula neste horário
+        return professor.nome not in self.ocupacao_professores[(dia, horario)]
+    
+    def _professor_apto(self, professor, dia, horario):
+        """Verifica a disponibilidade cadastrada do professor, sem olhar a grade"""
         # Converter dia para formato completo para compatibilidade
         dia_completo = self._converter_dia_para_completo(dia)
         
@@ -50,16 +112,7 @@ class SimpleGradeHoraria:
         
         # Verificar horários indisponíveis
         horario_key = f"{dia}_{horario}"
-        if horario_key in professor.horarios_indisponiveis:
-            return False
-        
-        # Verificar se professor já tem aula neste horário
-        for aula in aulas_alocadas:
-            if (aula.professor == professor.nome and 
-                aula.dia == dia and aula.horario == horario):
-                return False
-        
-        return True
+        return horario_key not in professor.horarios_indisponiveis
     
     def _converter_dia_para_completo(self, dia):
         """Converte dia abreviado para completo"""
@@ -69,91 +122,246 @@ class SimpleGradeHoraria:
         }
         return mapping.get(dia, dia)
     
-    def _sala_disponivel(self, sala, dia, horario, aulas_alocadas):
+    def _salas_compativeis(self, turma, disc):
+        """Salas que comportam a turma e atendem o tipo exigido pela disciplina"""
+        return [sala for sala in self.salas if sala_compativel(sala, turma, disc)]
+    
+    def _sala_disponivel(self, sala, dia, horario):
         """Verifica se sala está disponível no horário"""
-        for aula in aulas_alocadas:
-            if (aula.sala == sala.nome and 
-                aula.dia == dia and aula.horario == horario):
-                return False
-        return True
+        return sala.nome not in self.ocupacao_salas[(dia, horario)]
     
     def gerar_grade(self):
         """Gera grade usando algoritmo simples"""
         try:
-            aulas_alocadas = []
-            tentativas_maximas = 1000
-            
-            # Para cada turma, alocar disciplinas
-            for turma in self.turmas:
-                turma_nome = turma.nome
-                grupo_turma = turma.grupo
-                horarios_turma = self.obter_horarios_turma(turma_nome)
-                
-                # Disciplinas desta turma (do mesmo grupo)
-                disciplinas_turma = []
-                for disc in self.disciplinas:
-                    if turma_nome in disc.turmas and disc.grupo == grupo_turma:
-                        # Adicionar múltiplas instâncias baseado na carga horária
-                        for _ in range(disc.carga_semanal):
-                            disciplinas_turma.append(disc)
-                
-                # Embaralhar disciplinas para distribuição aleatória
-                random.shuffle(disciplinas_turma)
+            self._inicializar_ocupacao()
+            self.aulas_nao_alocadas = []
+            aulas_fixas = self._pre_alocar_fixas()
+            
+            if self.estrategia == "mais_restrita":
+                aulas_alocadas = aulas_fixas + self._gerar_mais_restrita()
+            else:
+                aulas_alocadas = aulas_fixas + self._gerar_aleatoria()
+            
+            if self.aulas_nao_alocadas and self.tempo_reparo > 0:
+                aulas_alocadas = self._reparar(aulas_alocadas)
+            
+            self._avisar_nao_alocadas()
+            return aulas_alocadas
+            
+        except Exception as e:
+            if self.exibir_avisos:
+                st.error(f"❌ Erro no algoritmo simples: {str(e)}")
+            return None
+    
+    def _pre_alocar_fixas(self):
+        """Registra as aulas fixas das turmas desta grade na ocupação"""
+        self.ids_fixas = set()
+        self.carga_fixa = Counter()
+        turmas_por_nome = {turma.nome: turma for turma in self.turmas}
+        disciplinas_por_chave = {(disc.nome, disc.grupo): disc for disc in self.disciplinas}
+        
+        aulas = []
+        for fixa in self.aulas_fixas:
+            turma = turmas_por_nome.get(fixa.turma)
+            if turma is None:
+                continue
+            disc = disciplinas_por_chave.get((fixa.disciplina, turma.grupo))
+            slot = (fixa.dia, fixa.horario)
+            if fixa.sala:
+                salas = [sala for sala in self.salas if sala.nome == fixa.sala]
+            else:
+                salas = self._salas_compativeis(turma, disc)
+            salas = [sala for sala in salas if self._sala_disponivel(sala, *slot)]
+            
+            professor_apto = any(
+                prof.nome == fixa.professor and self._professor_disponivel(prof, *slot)
+                for prof in self.professores
+            )
+            if disc is None or not salas or not professor_apto or self._turma_ocupada(turma.nome, *slot):
+                if self.exibir_avisos:
+                    st.warning(
+                        f"⚠️ Aula fixa de {fixa.disciplina} para {fixa.turma} "
+                        f"({fixa.dia} {fixa.horario}º) não é possível com os dados cadastrados "
+                        "e foi ignorada"
+                    )
+                continue
+            
+            aula = Aula(
+                turma=turma.nome,
+                dia=fixa.dia,
+                horario=fixa.horario,
+                horario_real=self.obter_horario_real(turma.nome, fixa.horario),
+                disciplina=disc.nome,
+                professor=fixa.professor,
+                sala=salas[0].nome,
+                grupo=turma.grupo
+            )
+            aulas.append(aula)
+            self._registrar_aula(aula)
+            self.ids_fixas.add(aula.id)
+            self.carga_fixa[(turma.nome, disc.nome)] += 1
+        return aulas
+    
+    def _carga_livre(self, turma, disc):
+        """Aulas semanais da disciplina que ainda faltam além das fixas"""
+        return max(disc.carga_semanal - self.carga_fixa[(turma.nome, disc.nome)], 0)
+    
+    def _unidades(self, turma, disc):
+        """Carga livre em unidades de alocação: [(aulas seguidas, quantidade)]
+        
+        Disciplinas com aula geminada viram blocos de `tamanho_bloco` aulas
+        mais as avulsas que sobram da divisão.
+        """
+        livre = self._carga_livre(turma, disc)
+        if disc.tamanho_bloco <= 1:
+            return [(1, livre)] if livre else []
+        blocos, avulsas = divmod(livre, disc.tamanho_bloco)
+        return [
+            (tamanho, quantidade)
+            for tamanho, quantidade in ((disc.tamanho_bloco, blocos), (1, avulsas))
+            if quantidade
+        ]
+    
+    def _horarios_bloco(self, turma_nome, inicio, tamanho):
+        """Horários seguidos a partir de `inicio`, ou None se passam do fim ou do intervalo"""
+        horarios = list(range(inicio, inicio + tamanho))
+        if horarios[-1] not in self.obter_horarios_turma(turma_nome):
+            return None
+        if any(self._eh_horario_intervalo(turma_nome, horario) for horario in horarios):
+            return None
+        return horarios
+    
+    def gerar_resultado(self):
+        """Gera a grade e devolve um ResultadoGrade com as aulas que faltaram e o motivo"""
+        inicio = time.time()
+        aulas = self.gerar_grade()
+        estatisticas = {
+            "algoritmo": "simples",
+            "estrategia": self.estrategia,
+            "semente": self.semente,
+            "tempo": time.time() - inicio
+        }
+        return montar_resultado(
+            aulas, self.turmas, self.professores, self.disciplinas, self.salas,
+            estatisticas, "Nenhum horário livre em comum para turma, professor e sala"
+        )
+    
+    def gerar_grade_paralela(self, execucoes=8, semente=0, max_processos=None):
+        """Roda várias execuções com sementes diferentes em processos separados
+        
+        As sementes de cada execução são derivadas de `semente`, então o
+        resultado é determinístico. Fica a grade com menos aulas não alocadas
+        e, no empate, menos janelas de professores.
+        """
+        try:
+            gerador = random.Random(semente)
+            sementes = [gerador.randrange(2**32) for _ in range(execucoes)]
+            argumentos = [
+                (self.turmas, self.professores, self.disciplinas, self.salas,
+                 self.dias_em_estendido, self.estrategia, self.tempo_reparo, s, self.aulas_fixas)
+                for s in sementes
+            ]
+            
+            with ProcessPoolExecutor(max_workers=max_processos) as executor:
+                resultados = list(executor.map(_executar_semente, argumentos))
+            
+            melhor = min(
+                range(len(resultados)),
+                key=lambda i: (resultados[i][0], resultados[i][1], i)
+            )
+            _, _, aulas_alocadas, nao_alocadas = resultados[melhor]
+            if aulas_alocadas is None:
+                st.error("❌ Nenhuma execução do algoritmo simples terminou com sucesso")
+                return None
+            
+            self.semente = sementes[melhor]
+            self.aulas_nao_alocadas = nao_alocadas
+            self._avisar_nao_alocadas()
+            return aulas_alocadas
+            
+        except Exception as e:
+            st.error(f"❌ Erro nas execuções paralelas: {str(e)}")
+            return None
+    
+    def _avisar_nao_alocadas(self):
+        """Exibe um aviso para cada aula que ficou sem horário"""
+        if not self.exibir_avisos:
+            return
+        for turma, disc in self.aulas_nao_alocadas:
+            st.warning(f"⚠️ Não foi possível alocar {disc.nome} para {turma.nome}")
+    
+    def _gerar_aleatoria(self):
+        """Aloca cada aula sorteando (dia, horário) até encontrar um livre"""
+        aulas_alocadas = []
+        tentativas_maximas = 1000
+        
+        # Para cada turma, alocar disciplinas
+        for turma in self.turmas:
+            turma_nome = turma.nome
+            grupo_turma = turma.grupo
+            horarios_turma = self.obter_horarios_turma(turma_nome)
+            
+            # Disciplinas desta turma (do mesmo grupo), uma entrada por aula ou bloco
+            disciplinas_turma = []
+            for disc in self.disciplinas:
+                if turma_nome in disc.turmas and disc.grupo == grupo_turma:
+                    # Adicionar múltiplas instâncias baseado na carga horária
+                    for tamanho, quantidade in self._unidades(turma, disc):
+                        disciplinas_turma.extend([(disc, tamanho)] * quantidade)
+            
+            # Embaralhar disciplinas para distribuição aleatória
+            self.rng.shuffle(disciplinas_turma)
+            
+            # Tentar alocar cada disciplina
+            for disc, tamanho in disciplinas_turma:
+                alocada = False
+                tentativas = 0
                 
-                # Tentar alocar cada disciplina
-                for disc in disciplinas_turma:
-                    alocada = False
-                    tentativas = 0
+                while not alocada and tentativas < tentativas_maximas:
+                    tentativas += 1
                     
-                    while not alocada and tentativas < tentativas_maximas:
-                        tentativas += 1
-                        
-                        # Escolher dia e horário aleatório
-                        dia = random.choice(DIAS_SEMANA)
-                        horario = random.choice(horarios_turma)
-                        
-                        # Pular horário de intervalo
-                        if self._eh_horario_intervalo(turma_nome, horario):
-                            continue
-                        
-                        # Verificar se turma já tem aula neste horário
-                        turma_ocupada = any(
-                            a for a in aulas_alocadas 
-                            if a.turma == turma_nome and a.dia == dia and a.horario == horario
-                        )
-                        if turma_ocupada:
-                            continue
-                        
-                        # Encontrar professor disponível
-                        professores_validos = []
-                        for prof in self.professores:
-                            if (disc.nome in prof.disciplinas and 
-                                prof.grupo in [grupo_turma, "AMBOS"] and
-                                self._professor_disponivel(prof, dia, horario, aulas_alocadas)):
-                                professores_validos.append(prof)
-                        
-                        if not professores_validos:
-                            continue
-                        
-                        # Encontrar sala disponível
-                        salas_validas = []
-                        for sala in self.salas:
-                            if self._sala_disponivel(sala, dia, horario, aulas_alocadas):
-                                salas_validas.append(sala)
-                        
-                        if not salas_validas:
-                            continue
-                        
-                        # Alocar aula
-                        professor = random.choice(professores_validos)
-                        sala = random.choice(salas_validas)
-                        horario_real = self.obter_horario_real(turma_nome, horario)
-                        
+                    # Escolher dia e horário (inicial, se for bloco) aleatório
+                    dia = self.rng.choice(DIAS_SEMANA)
+                    horarios = self._horarios_bloco(turma_nome, self.rng.choice(horarios_turma), tamanho)
+                    
+                    # Pular intervalo e blocos que passam do último horário
+                    if horarios is None:
+                        continue
+                    
+                    # Verificar se turma já tem aula nestes horários
+                    if any(self._turma_ocupada(turma_nome, dia, horario) for horario in horarios):
+                        continue
+                    
+                    # Encontrar professor disponível (o mesmo em todo o bloco)
+                    professores_validos = []
+                    for prof in self.professores:
+                        if (disc.nome in prof.disciplinas and 
+                            prof.grupo in [grupo_turma, "AMBOS"] and
+                            all(self._professor_disponivel(prof, dia, h) for h in horarios)):
+                            professores_validos.append(prof)
+                    
+                    if not professores_validos:
+                        continue
+                    
+                    # Encontrar sala disponível (a mesma em todo o bloco)
+                    salas_validas = []
+                    for sala in self._salas_compativeis(turma, disc):
+                        if all(self._sala_disponivel(sala, dia, h) for h in horarios):
+                            salas_validas.append(sala)
+                    
+                    if not salas_validas:
+                        continue
+                    
+                    # Alocar aula
+                    professor = self.rng.choice(professores_validos)
+                    sala = self.rng.choice(salas_validas)
+                    
+                    for horario in horarios:
                         aula = Aula(
                             turma=turma_nome,
                             dia=dia,
                             horario=horario,
-                            horario_real=horario_real,
+                            horario_real=self.obter_horario_real(turma_nome, horario),
                             disciplina=disc.nome,
                             professor=professor.nome,
                             sala=sala.nome,
@@ -161,13 +369,291 @@ class SimpleGradeHoraria:
                         )
                         
                         aulas_alocadas.append(aula)
-                        alocada = True
+                        self._registrar_aula(aula)
+                    alocada = True
+                
+                if not alocada:
+                    self.aulas_nao_alocadas.extend([(turma, disc)] * tamanho)
+        
+        return aulas_alocadas
+    
+    def _professores_elegiveis(self, disc, grupo_turma):
+        """Professores que podem lecionar a disciplina para o grupo da turma"""
+        return [
+            prof for prof in self.professores
+            if disc.nome in prof.disciplinas and prof.grupo in [grupo_turma, "AMBOS"]
+        ]
+    
+    def _slots_turma(self, turma_nome):
+        """Pares (dia, horário) de aula da turma, sem o intervalo"""
+        return [
+            (dia, horario)
+            for dia in DIAS_SEMANA
+            for horario in self.obter_horarios_turma(turma_nome)
+            if not self._eh_horario_intervalo(turma_nome, horario)
+        ]
+    
+    def _gerar_mais_restrita(self):
+        """Aloca primeiro as aulas com menos opções viáveis (estilo DSatur)
+        
+        As aulas idênticas de uma turma/disciplina formam um grupo com o
+        conjunto de opções (dia, horário, professor) ainda viáveis. A cada
+        passo o grupo com menor folga (opções - aulas restantes) é alocado
+        em uma de suas opções, e as opções dos demais grupos são podadas.
+        Aulas geminadas formam um grupo à parte, cujo horário é o inicial
+        do bloco e cuja opção ocupa os horários seguidos.
+        """
+        aulas_alocadas = []
+        
+        pendentes = {}
+        for turma in self.turmas:
+            slots = self._slots_turma(turma.nome)
+            for disc in self.disciplinas:
+                if turma.nome not in disc.turmas or disc.grupo != turma.grupo:
+                    continue
+                
+                for tamanho, quantidade in self._unidades(turma, disc):
+                    opcoes = set()
+                    if self._salas_compativeis(turma, disc):
+                        for prof in self._professores_elegiveis(disc, turma.grupo):
+                            for dia, inicio in slots:
+                                horarios = self._horarios_bloco(turma.nome, inicio, tamanho)
+                                if horarios and all(
+                                    self._professor_disponivel(prof, dia, horario)
+                                    and not self._turma_ocupada(turma.nome, dia, horario)
+                                    for horario in horarios
+                                ):
+                                    opcoes.add((dia, inicio, prof.nome))
                     
-                    if not alocada:
-                        st.warning(f"⚠️ Não foi possível alocar {disc.nome} para {turma_nome}")
+                    pendentes[(turma.nome, disc.nome, tamanho)] = {
+                        "turma": turma,
+                        "disciplina": disc,
+                        "restantes": quantidade,
+                        "opcoes": opcoes,
+                        "dias": set()
+                    }
+        
+        while pendentes:
+            chave = min(
+                pendentes,
+                key=lambda k: len(pendentes[k]["opcoes"]) - pendentes[k]["restantes"]
+            )
+            grupo = pendentes[chave]
+            turma_nome, disc_nome, tamanho = chave
             
-            return aulas_alocadas
+            if not grupo["opcoes"]:
+                for _ in range(grupo["restantes"] * tamanho):
+                    self.aulas_nao_alocadas.append((grupo["turma"], grupo["disciplina"]))
+                del pendentes[chave]
+                continue
             
-        except Exception as e:
-            st.error(f"❌ Erro no algoritmo simples: {str(e)}")
-            return None
\ No newline at end of file
+            # Preferir dias em que a turma ainda não tem esta disciplina
+            preferidas = [o for o in grupo["opcoes"] if o[0] not in grupo["dias"]]
+            dia, inicio, professor_nome = self.rng.choice(sorted(preferidas or grupo["opcoes"]))
+            horarios = range(inicio, inicio + tamanho)
+            
+            salas_validas = [
+                sala for sala in self._salas_compativeis(grupo["turma"], grupo["disciplina"])
+                if all(self._sala_disponivel(sala, dia, horario) for horario in horarios)
+            ]
+            if not salas_validas:
+                grupo["opcoes"].discard((dia, inicio, professor_nome))
+                continue
+            sala = self.rng.choice(salas_validas)
+            
+            for horario in horarios:
+                aula = Aula(
+                    turma=turma_nome,
+                    dia=dia,
+                    horario=horario,
+                    horario_real=self.obter_horario_real(turma_nome, horario),
+                    disciplina=disc_nome,
+                    professor=professor_nome,
+                    sala=sala.nome,
+                    grupo=grupo["turma"].grupo
+                )
+                aulas_alocadas.append(aula)
+                self._registrar_aula(aula)
+            
+            grupo["restantes"] -= 1
+            grupo["dias"].add(dia)
+            if grupo["restantes"] == 0:
+                del pendentes[chave]
+            
+            # Podar opções que deixaram de ser viáveis
+            ocupados = {horario: len(self.ocupacao_salas[(dia, horario)]) >= len(self.salas)
+                        for horario in horarios}  # horário -> salas esgotadas
+            for outro_chave, outro in pendentes.items():
+                mesma_turma = outro_chave[0] == turma_nome
+                outro["opcoes"] = {
+                    o for o in outro["opcoes"]
+                    if o[0] != dia or not any(
+                        horario in ocupados
+                        and (ocupados[horario] or mesma_turma or o[2] == professor_nome)
+                        for horario in range(o[1], o[1] + outro_chave[2])
+                    )
+                }
+        
+        return aulas_alocadas
+    
+    def _reparar(self, aulas_alocadas):
+        """Busca tabu que aloca as aulas pendentes ejetando aulas em conflito
+        
+        A cada iteração uma aula pendente é colocada no (dia, horário,
+        professor) que exige menos ejeções (min-conflicts); as aulas ejetadas
+        voltam para a fila e ficam proibidas de retornar ao mesmo horário por
+        algumas iterações. Ao fim do tempo, a melhor grade encontrada é mantida.
+        Com semente, o orçamento é um número fixo de iterações derivado de
+        `tempo_reparo`, para a mesma semente dar sempre a mesma grade.
+        """
+        limite = time.monotonic() + self.tempo_reparo
+        max_iteracoes = None
+        if self.semente is not None:
+            max_iteracoes = int(self.tempo_reparo * ITERACOES_REPARO_POR_SEGUNDO)
+        turmas_por_nome = {turma.nome: turma for turma in self.turmas}
+        disciplinas_por_chave = {(disc.nome, disc.grupo): disc for disc in self.disciplinas}
+        
+        def presa(aula):
+            """Aulas fixas e blocos geminados não são desfeitos pelo reparo"""
+            disc = disciplinas_por_chave[(aula.disciplina, aula.grupo)]
+            return aula.id in self.ids_fixas or disc.tamanho_bloco > 1
+        
+        # Aulas geminadas que faltaram ficam de fora: o reparo move uma aula por vez
+        pendentes = [item for item in self.aulas_nao_alocadas if item[1].tamanho_bloco <= 1]
+        impossiveis = [item for item in self.aulas_nao_alocadas if item[1].tamanho_bloco > 1]
+        melhor = (len(pendentes) + len(impossiveis), list(aulas_alocadas), pendentes + impossiveis)
+        tabu = {}  # (turma, disciplina, dia, horario) -> iteração em que expira
+        iteracao = 0
+        
+        while pendentes and (
+            iteracao < max_iteracoes if max_iteracoes is not None else time.monotonic() < limite
+        ):
+            iteracao += 1
+            turma, disc = pendentes.pop(self.rng.randrange(len(pendentes)))
+            
+            candidatos = []
+            menor_custo = None
+            compativel = False
+            salas_compativeis = self._salas_compativeis(turma, disc)
+            for dia, horario in self._slots_turma(turma.nome):
+                slot = (dia, horario)
+                for prof in self._professores_elegiveis(disc, turma.grupo):
+                    if not salas_compativeis or not self._professor_apto(prof, dia, horario):
+                        continue
+                    compativel = True
+                    
+                    ejetadas = []
+                    aula_turma = self.ocupacao_turmas[slot].get(turma.nome)
+                    if aula_turma:
+                        ejetadas.append(aula_turma)
+                    aula_prof = self.ocupacao_professores[slot].get(prof.nome)
+                    if aula_prof and aula_prof is not aula_turma:
+                        ejetadas.append(aula_prof)
+                    salas_liberadas = {aula.sala for aula in ejetadas}
+                    ocupantes = [
+                        self.ocupacao_salas[slot].get(sala.nome) for sala in salas_compativeis
+                    ]
+                    # Só tira a aula de uma sala se nenhuma compatível já ficou livre com as ejeções
+                    if (ocupantes and all(ocupantes)
+                            and not any(s.nome in salas_liberadas for s in salas_compativeis)):
+                        ejetaveis = [aula for aula in ocupantes if not presa(aula)]
+                        if not ejetaveis:
+                            continue
+                        ejetadas.append(self.rng.choice(ejetaveis))
+                    if any(presa(aula) for aula in ejetadas):
+                        continue  # Aulas fixas e geminadas nunca saem do lugar
+                    
+                    custo = len(ejetadas)
+                    if custo > 0 and tabu.get((turma.nome, disc.nome, dia, horario), 0) > iteracao:
+                        continue
+                    if menor_custo is None or custo < menor_custo:
+                        menor_custo = custo
+                        candidatos = []
+                    if custo == menor_custo:
+                        candidatos.append((dia, horario, prof, ejetadas))
+            
+            if not compativel:
+                impossiveis.append((turma, disc))
+                continue
+            if not candidatos:
+                pendentes.append((turma, disc))
+                continue
+            
+            dia, horario, prof, ejetadas = self.rng.choice(candidatos)
+            for ejetada in ejetadas:
+                self._remover_aula(ejetada)
+                aulas_alocadas.remove(ejetada)
+                tabu[(ejetada.turma, ejetada.disciplina, ejetada.dia, ejetada.horario)] = (
+                    iteracao + 7 + self.rng.randrange(5)
+                )
+                pendentes.append((
+                    turmas_por_nome[ejetada.turma],
+                    disciplinas_por_chave[(ejetada.disciplina, ejetada.grupo)]
+                ))
+            
+            salas_validas = [
+                sala for sala in salas_compativeis if self._sala_disponivel(sala, dia, horario)
+            ]
+            aula = Aula(
+                turma=turma.nome,
+                dia=dia,
+                horario=horario,
+                horario_real=self.obter_horario_real(turma.nome, horario),
+                disciplina=disc.nome,
+                professor=prof.nome,
+                sala=self.rng.choice(salas_validas).nome,
+                grupo=turma.grupo
+            )
+            aulas_alocadas.append(aula)
+            self._registrar_aula(aula)
+            
+            if len(pendentes) + len(impossiveis) < melhor[0]:
+                melhor = (len(pendentes) + len(impossiveis), list(aulas_alocadas), pendentes + impossiveis)
+        
+        if len(pendentes) + len(impossiveis) > melhor[0]:
+            _, aulas_alocadas, restantes = melhor
+            self._inicializar_ocupacao()
+            for aula in aulas_alocadas:
+                self._registrar_aula(aula)
+        else:
+            restantes = pendentes + impossiveis
+        
+        self.aulas_nao_alocadas = restantes
+        return aulas_alocadas
+
+
+def contar_janelas_professores(aulas):
+    """Conta horários vagos entre a primeira e a última aula de cada professor no dia"""
+    horarios_por_dia = defaultdict(set)
+    for aula in aulas:
+        horarios_por_dia[(aula.professor, aula.dia)].add(aula.horario)
+    
+    janelas = 0
+    for horarios in horarios_por_dia.values():
+        janelas += max(horarios) - min(horarios) + 1 - len(horarios)
+    return janelas
+
+
+def _executar_semente(argumentos):
+    """Executa uma rodada do algoritmo simples (usado pelos processos de gerar_grade_paralela)"""
+    (turmas, professores, disciplinas, salas,
+     dias_em_estendido, estrategia, tempo_reparo, semente, aulas_fixas) = argumentos
+    
+    scheduler = SimpleGradeHoraria(
+        turmas, professores, disciplinas, salas,
+        dias_em_estendido=dias_em_estendido,
+        estrategia=estrategia,
+        tempo_reparo=tempo_reparo,
+        semente=semente,
+        exibir_avisos=False,
+        aulas_fixas=aulas_fixas
+    )
+    aulas = scheduler.gerar_grade()
+    if aulas is None:
+        return (float("inf"), float("inf"), None, [])
+    return (
+        len(scheduler.aulas_nao_alocadas),
+        contar_janelas_professores(aulas),
+        aulas,
+        scheduler.aulas_nao_alocadas
+    )
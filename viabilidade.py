@@ -0,0 +1,260 @@
+from collections import Counter, defaultdict, deque
+from alocacao_salas import sala_compativel
+from models import AulaNaoAlocada, DIAS_SEMANA, HORARIOS_EFII, HORARIOS_EM, ResultadoGrade
+
+INFINITO = float("inf")
+
+def _slots_turma(turma_nome):
+    """Pares (dia, horário) de aula da turma, sem o intervalo"""
+    if 'em' in turma_nome.lower():
+        horarios, intervalo = HORARIOS_EM, 4
+    else:
+        horarios, intervalo = HORARIOS_EFII, 3
+    return {(dia, horario) for dia in DIAS_SEMANA for horario in horarios if horario != intervalo}
+
+def _professor_disponivel(professor, dia, horario):
+    """Verifica a disponibilidade cadastrada do professor"""
+    mapping = {
+        "seg": "segunda", "ter": "terca", "qua": "quarta",
+        "qui": "quinta", "sex": "sexta"
+    }
+    if mapping.get(dia, dia) not in professor.disponibilidade:
+        return False
+    return f"{dia}_{horario}" not in professor.horarios_indisponiveis
+
+
+class _RedeFluxo:
+    """Rede de fluxo com fluxo máximo por Dinic"""
+
+    def __init__(self):
+        self.arestas = defaultdict(list)  # nó -> [[destino, capacidade, índice da reversa]]
+
+    def adicionar(self, origem, destino, capacidade):
+        self.arestas[origem].append([destino, capacidade, len(self.arestas[destino])])
+        self.arestas[destino].append([origem, 0, len(self.arestas[origem]) - 1])
+
+    def _niveis(self, fonte, sumidouro):
+        nivel = {fonte: 0}
+        fila = deque([fonte])
+        while fila:
+            no = fila.popleft()
+            for destino, capacidade, _ in self.arestas[no]:
+                if capacidade > 0 and destino not in nivel:
+                    nivel[destino] = nivel[no] + 1
+                    fila.append(destino)
+        return nivel if sumidouro in nivel else None
+
+    def _empurrar(self, no, sumidouro, fluxo, nivel, proxima):
+        if no == sumidouro:
+            return fluxo
+        arestas = self.arestas[no]
+        while proxima[no] < len(arestas):
+            aresta = arestas[proxima[no]]
+            destino, capacidade, reversa = aresta
+            if capacidade > 0 and nivel.get(destino) == nivel[no] + 1:
+                enviado = self._empurrar(destino, sumidouro, min(fluxo, capacidade), nivel, proxima)
+                if enviado > 0:
+                    aresta[1] -= enviado
+                    self.arestas[destino][reversa][1] += enviado
+                    return enviado
+            proxima[no] += 1
+        return 0
+
+    def fluxo_maximo(self, fonte, sumidouro):
+        total = 0
+        while True:
+            nivel = self._niveis(fonte, sumidouro)
+            if nivel is None:
+                return total
+            proxima = defaultdict(int)
+            while True:
+                enviado = self._empurrar(fonte, sumidouro, INFINITO, nivel, proxima)
+                if enviado == 0:
+                    break
+                total += enviado
+
+    def alcancaveis(self, fonte):
+        """Nós alcançáveis pela rede residual (lado da fonte do corte mínimo)"""
+        vistos = {fonte}
+        fila = deque([fonte])
+        while fila:
+            no = fila.popleft()
+            for destino, capacidade, _ in self.arestas[no]:
+                if capacidade > 0 and destino not in vistos:
+                    vistos.add(destino)
+                    fila.append(destino)
+        return vistos
+
+
+def verificar_viabilidade(turmas, professores, disciplinas, salas=None):
+    """Pré-análise polinomial da viabilidade da grade
+
+    Monta a rede fonte -> (turma, disciplina) com a carga semanal ->
+    professores aptos -> sumidouro com o número de horários disponíveis de
+    cada professor. Se o fluxo máximo não cobre a demanda, o corte mínimo
+    aponta grupos de aulas cujos professores não têm horários suficientes
+    (violação da condição de Hall). Retorna a lista de problemas encontrados.
+    """
+    problemas = []
+    rede = _RedeFluxo()
+    demanda_total = 0
+    slots_professor = defaultdict(set)
+    demandas = {}
+
+    for turma in turmas:
+        slots = _slots_turma(turma.nome)
+        carga_turma = 0
+        for disc in disciplinas:
+            if turma.nome not in disc.turmas or disc.grupo != turma.grupo:
+                continue
+            carga_turma += disc.carga_semanal
+            demanda = ("demanda", turma.nome, disc.nome)
+            demandas[demanda] = disc.carga_semanal
+            demanda_total += disc.carga_semanal
+            rede.adicionar("fonte", demanda, disc.carga_semanal)
+            for prof in professores:
+                if disc.nome in prof.disciplinas and prof.grupo in [turma.grupo, "AMBOS"]:
+                    rede.adicionar(demanda, ("professor", prof.nome), INFINITO)
+                    slots_professor[prof.nome].update(
+                        slot for slot in slots if _professor_disponivel(prof, *slot)
+                    )
+
+        if carga_turma > len(slots):
+            problemas.append(f"Turma {turma.nome}: {carga_turma} aulas para {len(slots)} horários")
+
+    for prof_nome, slots in slots_professor.items():
+        rede.adicionar(("professor", prof_nome), "sumidouro", len(slots))
+
+    if rede.fluxo_maximo("fonte", "sumidouro") < demanda_total:
+        # Componentes do lado da fonte do corte mínimo: demanda maior que a capacidade
+        lado_fonte = rede.alcancaveis("fonte")
+        componente = {}
+
+        def raiz(no):
+            while componente.setdefault(no, no) != no:
+                no = componente[no]
+            return no
+
+        for no in lado_fonte:
+            if no[0] != "demanda":
+                continue
+            raiz(no)
+            for destino, _, _ in rede.arestas[no]:
+                if destino in lado_fonte and destino[0] == "professor":
+                    componente[raiz(destino)] = raiz(no)
+
+        grupos = defaultdict(lambda: {"demandas": [], "professores": []})
+        for no in componente:
+            grupos[raiz(no)]["demandas" if no[0] == "demanda" else "professores"].append(no)
+
+        sem_professor = []
+        for grupo in grupos.values():
+            demanda = sum(demandas[no] for no in grupo["demandas"])
+            nomes_professores = sorted(no[1] for no in grupo["professores"])
+            capacidade = sum(len(slots_professor[nome]) for nome in nomes_professores)
+            if not nomes_professores:
+                sem_professor.extend(grupo["demandas"])
+            elif demanda > capacidade:
+                problemas.append(
+                    f"Professores {', '.join(nomes_professores)}: {capacidade} horários "
+                    f"disponíveis para {demanda} aulas de {_resumir_demandas(grupo['demandas'])}"
+                )
+
+        if sem_professor:
+            demanda = sum(demandas[no] for no in sem_professor)
+            problemas.append(
+                f"Sem professor apto para {demanda} aulas de {_resumir_demandas(sem_professor)}"
+            )
+
+    if salas is not None:
+        problemas.extend(_verificar_salas(turmas, disciplinas, salas))
+
+    return problemas
+
+
+def _resumir_demandas(nos_demanda, limite=5):
+    """Texto curto 'Disciplina (turma1, turma2, +N)' para uma lista de demandas"""
+    turmas_por_disciplina = defaultdict(list)
+    for _, turma_nome, disc_nome in sorted(nos_demanda):
+        turmas_por_disciplina[disc_nome].append(turma_nome)
+
+    partes = []
+    for disc_nome, turmas_nomes in sorted(turmas_por_disciplina.items()):
+        texto = ", ".join(turmas_nomes[:limite])
+        if len(turmas_nomes) > limite:
+            texto += f", +{len(turmas_nomes) - limite}"
+        partes.append(f"{disc_nome} ({texto})")
+    return "; ".join(partes)
+
+
+def _verificar_salas(turmas, disciplinas, salas):
+    """Aulas da semana contra os horários de aula das salas, no total e por tipo de sala
+
+    Cada sala conta só os horários em que alguma turma tem aula de fato (sem
+    os intervalos); disciplinas sem tipo de sala podem usar qualquer sala.
+    """
+    problemas = []
+    horarios_semana = len(set().union(*(_slots_turma(turma.nome) for turma in turmas)))
+    demanda_total = 0
+    demanda_tipo = defaultdict(int)
+    for turma in turmas:
+        for disc in disciplinas:
+            if turma.nome in disc.turmas and disc.grupo == turma.grupo:
+                demanda_total += disc.carga_semanal
+                if disc.tipo_sala:
+                    demanda_tipo[disc.tipo_sala] += disc.carga_semanal
+
+    capacidade_total = len(salas) * horarios_semana
+    if demanda_total > capacidade_total:
+        problemas.append(
+            f"Salas: {capacidade_total} horários de aula para {demanda_total} aulas na semana"
+        )
+    for tipo_sala, demanda in demanda_tipo.items():
+        capacidade = sum(horarios_semana for sala in salas if sala.tipo == tipo_sala)
+        if demanda > capacidade:
+            problemas.append(
+                f"Salas do tipo {tipo_sala}: {capacidade} horários para {demanda} aulas"
+            )
+    return problemas
+
+
+def motivo_nao_alocacao(turma, disc, professores, salas):
+    """Motivo estrutural para uma aula não caber na grade, ou None se não houver"""
+    aptos = [
+        prof for prof in professores
+        if disc.nome in prof.disciplinas and prof.grupo in [turma.grupo, "AMBOS"]
+    ]
+    if not aptos:
+        return f"Nenhum professor de {disc.nome} atende o grupo {turma.grupo}"
+    if not any(sala_compativel(sala, turma, disc) for sala in salas):
+        exigencias = []
+        if disc.tipo_sala:
+            exigencias.append(f"tipo {disc.tipo_sala}")
+        if turma.alunos:
+            exigencias.append(f"{turma.alunos} alunos")
+        return f"Nenhuma sala compatível ({', '.join(exigencias)})"
+    slots = _slots_turma(turma.nome)
+    if not any(_professor_disponivel(prof, *slot) for prof in aptos for slot in slots):
+        return "Professores aptos indisponíveis em todos os horários da turma"
+    return None
+
+
+def montar_resultado(aulas, turmas, professores, disciplinas, salas, estatisticas, motivo_padrao):
+    """Monta o ResultadoGrade comparando a grade com a carga semanal de cada turma
+
+    Cada aula faltante recebe o motivo estrutural encontrado ou, se não
+    houver, o `motivo_padrao` informado pelo algoritmo.
+    """
+    aulas = aulas or []
+    alocadas = Counter((aula.turma, aula.disciplina) for aula in aulas)
+    nao_alocadas = []
+    for turma in turmas:
+        for disc in disciplinas:
+            if turma.nome not in disc.turmas or disc.grupo != turma.grupo:
+                continue
+            falta = disc.carga_semanal - alocadas[(turma.nome, disc.nome)]
+            if falta <= 0:
+                continue
+            motivo = motivo_nao_alocacao(turma, disc, professores, salas) or motivo_padrao
+            nao_alocadas.extend(AulaNaoAlocada(turma.nome, disc.nome, motivo) for _ in range(falta))
+    return ResultadoGrade(aulas=aulas, nao_alocadas=nao_alocadas, estatisticas=dict(estatisticas))